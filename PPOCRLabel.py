@@ -17,13 +17,21 @@ import argparse
 import ast
 import codecs
 import json
+import multiprocessing
 import os
 import platform
 import subprocess
 import sys
+import time
 from functools import partial
 
-import openpyxl
+__dir__ = os.path.dirname(__file__)
+
+sys.path.append(os.path.join(__dir__, ""))
+
+# first of the project modules so the startup phases include the imports below
+from libs.startupProfiler import STARTUP_PROFILER
+
 import cv2
 import numpy as np
 
@@ -71,18 +79,16 @@ from PyQt5.QtWidgets import (
     QAbstractItemView,
     QMenu,
     QAction,
+    QActionGroup,
     QPushButton,
 )
 
-__dir__ = os.path.dirname(__file__)
-
-from pandas.io.sql import has_table
+STARTUP_PROFILER.mark("import cv2, numpy, PyQt5")
 
-sys.path.append(os.path.join(__dir__, ""))
-
-import paddle
-from paddleocr import PaddleOCR, PPStructureV3, TextRecognition, TextDetection
-import libs.resources
+# paddle, paddleocr, openpyxl and tablepyxl are imported by the features that use them,
+# so the window is drawn before any of them is loaded, see libs/importReport.py
+# icons and strings are read from resources/ when first used, libs/resources.py is only
+# imported if those files are not shipped
 from libs.constants import (
     SETTING_ADVANCE_MODE,
     SETTING_DRAW_SQUARE,
@@ -123,13 +129,41 @@ from libs.stringBundle import StringBundle
 from libs.canvas import Canvas
 from libs.zoomWidget import ZoomWidget
 from libs.autoDialog import AutoDialog
+from libs.autoSchedule import ORDER_POLICIES
+from libs.annotationJournal import AnnotationJournal
+from libs.annotationStore import AnnotationStore
+from libs.autoJournal import AutoRecJournal
+from libs.inferenceBackend import BACKEND_NAMES, createBackend
+from libs.inferenceProfile import (
+    PROFILE_NAMES,
+    SPEED_PROFILES,
+    AutotuneWorker,
+    modelSummary,
+    resolveProfile,
+)
+from libs.labelCodec import LabelDict, readLabelFile, writeLabelFile, writeStateFile
+from libs.labelIndex import LabelFileIndex, LazyLabels, isLargeLabelFile
+from libs.lazyModel import LazyModel, ModelLoader
+from libs.lookAhead import LookAheadWorker
+from libs.modelRegistry import (
+    MODEL_REGISTRY,
+    ModelRegistry,
+    buildModel,
+    pipelinePredictors,
+    resolveDevice,
+)
+from libs.ocrPool import OCRProcessPool, reportDownscale
+from libs.predictionCache import DEFAULT_CACHE_DIR, PredictionCache, pipelineIdentity
+from libs.sessionSnapshot import DirScanner, SessionSnapshot, fileSignature
+from libs.statusIndex import StatusIndex, imageKey
 from libs.labelDialog import LabelDialog
 from libs.colorDialog import ColorDialog
 from libs.hashableQListWidgetItem import HashableQListWidgetItem
 from libs.editinlist import EditInList
 from libs.unique_label_qlist_widget import UniqueLabelQListWidget
 from libs.keyDialog import KeyDialog
-from tablepyxl import tablepyxl
+
+STARTUP_PROFILER.mark("import libs")
 
 import logging
 from datetime import datetime
@@ -141,6 +175,19 @@ __appname__ = "PPOCRLabel"
 
 LABEL_COLORMAP = label_colormap()
 
+# languages of the model selection dialog and the pipeline lang they load
+MODEL_LANGUAGES = {
+    "Chinese & English": "ch",
+    "English": "en",
+    "French": "french",
+    "German": "german",
+    "Korean": "korean",
+    "Japanese": "japan",
+}
+
+# predicted once by freshly built pipelines so the first real prediction is fast
+WARMUP_IMAGE = "./data/paddle.png" if os.path.exists("./data/paddle.png") else None
+
 
 class MainWindow(QMainWindow):
     FIT_WINDOW, FIT_WIDTH, MANUAL_ZOOM = list(range(3))
@@ -160,6 +207,24 @@ class MainWindow(QMainWindow):
         cls_model_dir=None,
         label_font_path=None,
         selected_shape_color=(255, 255, 0),
+        auto_rec_batch_size=None,
+        auto_rec_workers=1,
+        auto_rec_threads_per_worker=None,
+        pred_cache_dir=None,
+        pred_cache_size_mb=1024,
+        look_ahead_num=0,
+        auto_rec_log_lines=1000,
+        det_max_side=0,
+        auto_rec_order="list",
+        auto_rec_priority_file=None,
+        model_memory_mb=3072,
+        preload_langs=None,
+        profile_startup=None,
+        inference_profile="auto",
+        speed_profile="server",
+        inference_backend="paddle",
+        stub_latency_ms=0,
+        annotation_store="text",
     ):
         super(MainWindow, self).__init__()
         self.setWindowTitle(__appname__)
@@ -174,10 +239,30 @@ class MainWindow(QMainWindow):
         self.settings = Settings()
         self.settings.load()
         settings = self.settings
+        STARTUP_PROFILER.mark("Settings.load")
         self.lang = lang
-        self.gpu = "gpu" if paddle.is_compiled_with_cuda() and gpu else "cpu"
+        # the requested device, models fall back to the CPU when they are built if paddle
+        # has no CUDA, see resolveDevice
+        self.gpu = "gpu" if gpu else "cpu"
         self.img_list_natural_sort = img_list_natural_sort
         self.bbox_auto_zoom_center = bbox_auto_zoom_center
+        # MKLDNN, CPU threads and batch size, see libs.inferenceProfile
+        self.inferenceProfile = resolveProfile(inference_profile)
+        if auto_rec_batch_size is None:
+            auto_rec_batch_size = self.inferenceProfile["batch_size"]
+        self.auto_rec_batch_size = auto_rec_batch_size
+        self.auto_rec_workers = auto_rec_workers
+        self.auto_rec_threads_per_worker = auto_rec_threads_per_worker
+        self.auto_rec_log_lines = auto_rec_log_lines
+        # order of the images in an auto recognition job, see libs.autoSchedule
+        self.auto_rec_order = auto_rec_order
+        self.auto_rec_priority_file = auto_rec_priority_file
+        # large scans are detected at this longest side, 0 keeps the original size
+        self.det_max_side = det_max_side
+        self.ocrPool = None
+        self.autoRecJournal = None
+        self.autoRecDone = set()  # images finished by an interrupted auto recognition
+        self.autoRecRunning = False
 
         # Load string bundle for i18n
         if lang not in ["ch", "en"]:
@@ -185,6 +270,7 @@ class MainWindow(QMainWindow):
         self.stringBundle = StringBundle.getBundle(
             localeStr="zh-CN" if lang == "ch" else "en"
         )  # 'en'
+        STARTUP_PROFILER.mark("StringBundle")
 
         def get_str(str_id):
             return self.stringBundle.getString(str_id)
@@ -197,49 +283,95 @@ class MainWindow(QMainWindow):
 
         self.defaultSaveDir = default_save_dir
 
-        params = {
-            "use_doc_orientation_classify": False,
-            "use_doc_unwarping": False,
-            "use_textline_orientation": True,
-            "device": self.gpu,
-            "lang": self.lang,
-            "text_detection_model_name": "PP-OCRv5_server_det",
-            "text_recognition_model_name": "PP-OCRv5_server_rec",
-            "enable_mkldnn": False,
+        # models and orientation stage used by auto recognition and re-recognition
+        self.speed_profile = speed_profile
+        self.model_dirs = {
+            "text_detection_model_dir": det_model_dir,
+            "text_recognition_model_dir": rec_model_dir,
+            "text_line_orientation_model_dir": cls_model_dir,
         }
+        # kept so that auto recognition worker processes build the same pipeline
+        self.ocr_params = self.defaultOcrParams()
+        # every feature runs its inference through this, see libs.inferenceBackend
+        self.model = inference_backend
+        self.backend = createBackend(
+            inference_backend,
+            getModel=lambda kind: self.models[kind].get(),
+            latency_ms=stub_latency_ms,
+        )
+        # models are built on first use or by the background loader once the window is up,
+        # actions that need a model which is not ready show a loading message instead
+        self.models = {}
+        self.preloadModels = []
+        # built on first use instead: only cell re-recognition needs a standalone detector
+        self.onDemandModels = {"det"}
+        if inference_backend == "paddle":
+            self.models = {
+                "ocr": self.newOcrModel(),
+                "table": self.newTableModel(),
+            }
+            self.models.update(self.newPredictorModels())
+            # languages loaded ahead so the first switch to them is instant
+            self.preloadModels = [
+                self.newOcrModel(self.languageParams(lang), pin=False)
+                for lang in preload_langs or []
+                if self.languageParams(lang) != self.ocr_params
+            ]
+        # OCR pipelines of recently used languages are kept within this budget
+        MODEL_REGISTRY.setBudget(model_memory_mb)
+        self.modelLoader = ModelLoader()
+        self.modelLoader.modelLoaded.connect(self.modelLoaded)
+        self.modelLoader.modelFailed.connect(self.modelFailed)
+        # the startup report is complete once the first round of models is loaded
+        self.profile_startup = profile_startup
+        self.modelLoader.finished.connect(self.startupFinished)
+        if self.models:
+            QTimer.singleShot(0, self.loadModelsInBackground)
+        else:
+            QTimer.singleShot(0, self.startupFinished)
 
-        if det_model_dir is not None:
-            params["text_detection_model_dir"] = det_model_dir
-        if rec_model_dir is not None:
-            params["text_recognition_model_dir"] = rec_model_dir
-        if cls_model_dir is not None:
-            params["text_line_orientation_model_dir"] = cls_model_dir
-
-        self.ocr = PaddleOCR(**params)
-        self.text_recognizer = TextRecognition(
-            model_name="PP-OCRv5_server_rec",
-            model_dir=rec_model_dir,
-            device=self.gpu,
-        )
-        self.text_detector = TextDetection(
-            model_name="PP-OCRv5_server_det",
-            model_dir=det_model_dir,
-            device=self.gpu,
-        )
-        self.table_ocr = PPStructureV3(
-            use_doc_orientation_classify=False,
-            use_doc_unwarping=False,
-            use_seal_recognition=False,
-            use_table_recognition=True,
-            use_formula_recognition=False,
-            use_chart_recognition=False,
-            use_region_detection=False,
-            device=self.gpu,
+        # content-hash cache of predictions shared by auto/re-recognition and table recognition
+        self.predCache = None
+        # stub results must never be served as real predictions
+        if pred_cache_size_mb > 0 and inference_backend == "paddle":
+            try:
+                self.predCache = PredictionCache(
+                    pred_cache_dir or DEFAULT_CACHE_DIR, pred_cache_size_mb
+                )
+            except Exception as e:
+                logger.warning("Prediction cache is disabled: %s", e)
+        self.ocrModelId = pipelineIdentity(
+            "ocr", dict(self.ocr_params, det_max_side=self.det_max_side)
+        )
+        self.recModelId = self.recognizerIdentity()
+        self.describeCachedModels()
+        self.tableModelId = pipelineIdentity(
+            "table", {"det_max_side": self.det_max_side}
         )
 
-        if os.path.exists("./data/paddle.png"):
-            self.ocr.predict("./data/paddle.png")
-            self.table_ocr.predict("./data/paddle.png")
+        # speculative recognition of the next images in navigation order
+        self.look_ahead_num = look_ahead_num
+        self.lookAheadDir = None
+        self.cacheLabelDirty = False
+        # warm-start state of the open directory, see libs.sessionSnapshot
+        self.session = None
+        self.dirSignature = None
+        self.dirScanner = None
+        # checked images saved by appending to Label.txt.journal, see journalImage
+        self.annotationJournal = None
+        self.unjournaled = set()  # changed images waiting for the next auto save
+        # "sqlite" keeps the annotations in annotations.db of the directory and writes
+        # the label files only on full saves, see libs.annotationStore
+        self.annotation_store = annotation_store
+        self.annotationStore = None
+        self.lookAhead = LookAheadWorker(
+            None if self.models else self.backend,
+            self.predCache,
+            self.ocrModelId,
+            self.det_max_side,
+        )
+        self.lookAhead.resultValue.connect(self.lookAheadResultReady)
+        STARTUP_PROFILER.mark("model setup")
 
         # For loading all image under a directory
         self.mImgList = []
@@ -275,7 +407,6 @@ class MainWindow(QMainWindow):
         self.shapesToItemsbox = {}
         self.prevLabelText = get_str("tempLabel")
         self.noLabelText = get_str("nullLabel")
-        self.model = "paddle"
         self.PPreader = None
         self.autoSaveNum = 5
 
@@ -1202,7 +1333,42 @@ class MainWindow(QMainWindow):
             ),
         )
 
-        addActions(self.menus.autolabel, (AutoRec, reRec, cellreRec, alcm, None, help))
+        self.lookAheadOption = QAction(
+            "预识别后续图片" if self.lang == "ch" else "Look-ahead Recognition", self
+        )
+        self.lookAheadOption.setCheckable(True)
+        self.lookAheadOption.setChecked(self.look_ahead_num > 0)
+        self.lookAheadOption.triggered.connect(self.toggleLookAhead)
+
+        autotune = QAction(
+            "自动调优推理参数" if self.lang == "ch" else "Autotune CPU Inference", self
+        )
+        autotune.triggered.connect(self.autotuneInference)
+        self.autotuneWorker = None
+
+        speedMenu = QMenu("速度模式" if self.lang == "ch" else "Speed Profile", self)
+        speedGroup = QActionGroup(self)
+        for name in SPEED_PROFILES:
+            action = QAction(name, speedGroup)
+            action.setCheckable(True)
+            action.setChecked(name == self.speed_profile)
+            action.triggered.connect(partial(self.setSpeedProfile, name))
+            speedMenu.addAction(action)
+
+        addActions(
+            self.menus.autolabel,
+            (
+                AutoRec,
+                reRec,
+                cellreRec,
+                alcm,
+                self.lookAheadOption,
+                speedMenu,
+                autotune,
+                None,
+                help,
+            ),
+        )
 
         self.menus.file.aboutToShow.connect(self.updateFileMenu)
 
@@ -1267,9 +1433,18 @@ class MainWindow(QMainWindow):
 
         # Since loading the file may take some time, make sure it runs in the background.
         if self.filePath and os.path.isdir(self.filePath):
-            self.queueEvent(partial(self.importDirImages, self.filePath or ""))
+            self.queueEvent(
+                STARTUP_PROFILER.timed(
+                    "import directory (queued)",
+                    partial(self.importDirImages, self.filePath or ""),
+                )
+            )
         elif self.filePath:
-            self.queueEvent(partial(self.loadFile, self.filePath or ""))
+            self.queueEvent(
+                STARTUP_PROFILER.timed(
+                    "load file (queued)", partial(self.loadFile, self.filePath or "")
+                )
+            )
 
         self.keyDialog = None
 
@@ -1282,9 +1457,12 @@ class MainWindow(QMainWindow):
         self.labelCoordinates = QLabel("")
         self.statusBar().addPermanentWidget(self.labelCoordinates)
 
+        STARTUP_PROFILER.mark("UI build")
+
         # Open Dir if deafult file
         if self.filePath and os.path.isdir(self.filePath):
             self.openDirDialog(dirpath=self.filePath, silent=True)
+        STARTUP_PROFILER.mark("restore last directory")
 
         # load label font
         self.label_font_family = None
@@ -2309,15 +2487,7 @@ class MainWindow(QMainWindow):
             self.canvas.verified = False
 
     def validFilestate(self, filePath):
-        if filePath in self.fileStatedict.keys() and self.fileStatedict[filePath] == 1:
-            return True
-        elif (
-            self.getImglabelidx(filePath) in self.fileStatedict.keys()
-            and self.fileStatedict[self.getImglabelidx(filePath)] == 1
-        ):
-            return True
-        else:
-            return False
+        return self.fileStatedict.isChecked(filePath)
 
     def resizeEvent(self, event):
         if (
@@ -2388,17 +2558,26 @@ class MainWindow(QMainWindow):
             settings[SETTING_PAINT_INDEX] = self.displayIndexOption.isChecked()
             settings[SETTING_DRAW_SQUARE] = self.drawSquaresOption.isChecked()
             settings.save()
+            self.stopAutoRecognition()
+            self.lookAhead.stop()
+            self.modelLoader.stop()
+            if self.dirScanner is not None:
+                self.dirScanner.wait()
+            if self.ocrPool is not None:
+                self.ocrPool.terminate()
             try:
                 self.saveLabelFile()
             except Exception:
                 pass
+            self.saveSession()
 
     def loadRecent(self, filename):
         if self.mayContinue():
             logger.info("Loading recent file: %s", filename)
             self.loadFile(filename)
 
-    def scanAllImages(self, folderPath):
+    def listImages(self, folderPath):
+        """Absolute paths of the images in folderPath, unsorted"""
         extensions = [
             ".%s" % fmt.data().decode("ascii").lower()
             for fmt in QImageReader.supportedImageFormats()
@@ -2410,6 +2589,10 @@ class MainWindow(QMainWindow):
                 relativePath = os.path.join(folderPath, file)
                 path = os.path.abspath(relativePath)
                 images.append(path)
+        return images
+
+    def scanAllImages(self, folderPath):
+        images = self.listImages(folderPath)
         if self.img_list_natural_sort:
             natural_sort(images, key=lambda x: x.lower())
         else:
@@ -2465,12 +2648,14 @@ class MainWindow(QMainWindow):
     def init_key_list(self, label_dict):
         if not self.kie_mode:
             return
-        # load key_cls
+        # load key_cls, the records of a lazily read file are parsed again when they are
+        # shown, so their default is applied there instead of stored
+        lazy = isinstance(label_dict, LazyLabels)
         for image, info in label_dict.items():
             for box in info:
-                if "key_cls" not in box:
+                if "key_cls" not in box and not lazy:
                     box.update({"key_cls": "None"})
-                self.existed_key_cls_set.add(box["key_cls"])
+                self.existed_key_cls_set.add(box.get("key_cls", "None"))
         if len(self.existed_key_cls_set) > 0:
             for key_text in self.existed_key_cls_set:
                 if not self.keyList.findItemsByLabel(key_text):
@@ -2495,17 +2680,44 @@ class MainWindow(QMainWindow):
     def importDirImages(self, dirpath, isDelete=False):
         if not self.mayContinue() or not dirpath:
             return
+        if not isDelete:
+            # results of a background job belong to the directory it was started in
+            self.stopAutoRecognition()
         if self.defaultSaveDir and self.defaultSaveDir != dirpath:
             self.saveLabelFile()
+            self.saveSession()
 
+        resumeKeys = []
+        journaled = 0
         if not isDelete:
-            self.loadFilestate(dirpath)
-            self.PPlabelpath = dirpath + "/Label.txt"
-            self.PPlabel = self.loadLabelFile(self.PPlabelpath)
-            self.Cachelabelpath = dirpath + "/Cache.cach"
-            self.Cachelabel = self.loadLabelFile(self.Cachelabelpath)
+            self.session = SessionSnapshot(dirpath)
+            self.session.load()
+            self.unjournaled = set()
+            if self.annotation_store == "sqlite":
+                journaled = self.openAnnotationStore(dirpath)
+            else:
+                self.loadFilestate(dirpath)
+                self.PPlabelpath = dirpath + "/Label.txt"
+                self.PPlabel = self.loadLabelFile(self.PPlabelpath, lazy=True)
+                # saves since Label.txt and fileState.txt were last written in full
+                self.annotationJournal = AnnotationJournal(
+                    dirpath + "/Label.txt.journal"
+                )
+                journaled = self.annotationJournal.replay(
+                    self.fileStatedict, self.PPlabel
+                )
+                self.Cachelabelpath = dirpath + "/Cache.cach"
+                self.Cachelabel = self.loadLabelFile(self.Cachelabelpath)
+            resumeKeys = self.replayAutoRecJournal(dirpath)
             if self.Cachelabel:
-                self.PPlabel = dict(self.Cachelabel, **self.PPlabel)
+                if isinstance(self.PPlabel, LazyLabels):
+                    self.PPlabel.defaults = dict(self.Cachelabel)
+                else:
+                    merged = LabelDict(
+                        self.Cachelabel, unparsed=getattr(self.PPlabel, "unparsed", ())
+                    )
+                    merged.update(self.PPlabel)
+                    self.PPlabel = merged
 
             self.init_key_list(self.PPlabel)
 
@@ -2525,18 +2737,37 @@ class MainWindow(QMainWindow):
 
         self.filePath = None
         self.fileListWidget.clear()
-        self.mImgList = self.scanAllImages(dirpath)
+        self.mImgList = None
+        if not isDelete:
+            # the list of the last session is shown at once and checked in the background
+            self.mImgList = self.session.imageList(self.img_list_natural_sort)
+        if self.mImgList is not None:
+            self.dirSignature = self.session.dir_signature
+            if fileSignature(dirpath) != self.dirSignature:
+                if self.dirScanner is not None:
+                    self.dirScanner.wait()
+                self.dirScanner = DirScanner(dirpath, self.scanAllImages)
+                self.dirScanner.scanned.connect(self.dirRescanned)
+                self.dirScanner.start()
+        else:
+            self.dirSignature = fileSignature(dirpath)
+            self.mImgList = self.scanAllImages(dirpath)
         self.mImgList5 = self.mImgList[:5]
+        if resumeKeys:
+            # continue at the first image the interrupted auto recognition did not reach
+            resumeKeys = set(resumeKeys)
+            for i, imgPath in enumerate(self.mImgList):
+                if self.getImglabelidx(imgPath) in resumeKeys:
+                    imgListCurrIndex = i
+                    break
         self.openNextImg(imgListCurrIndex=imgListCurrIndex)
-        doneicon = newIcon("done")
-        closeicon = newIcon("close")
-        for imgPath in self.mImgList:
-            filename = os.path.basename(imgPath)
-            if self.validFilestate(imgPath) is True:
-                item = QListWidgetItem(doneicon, filename)
-            else:
-                item = QListWidgetItem(closeicon, filename)
-            self.fileListWidget.addItem(item)
+        if resumeKeys and imgListCurrIndex is not None:
+            self.currIndex = imgListCurrIndex
+        done = None
+        if isDelete or not journaled:
+            # the stored check state does not include the journal or unexported changes
+            done = self.session.doneFlags(self.mImgList, self.fileStatepath)
+        self.fillFileList(done)
 
         logger.info("DirPath in importDirImages is %s", dirpath)
         self.iconlist.clear()
@@ -2570,6 +2801,69 @@ class MainWindow(QMainWindow):
             + f" ({fileListWidgetCurrentRow + 1}/{self.fileListWidget.count()})"
         )  # show image count
 
+    def fillFileList(self, done=None):
+        """One item per image of mImgList, done is the check state of each if known"""
+        if done is None:
+            done = [self.validFilestate(imgPath) is True for imgPath in self.mImgList]
+        doneicon = newIcon("done")
+        closeicon = newIcon("close")
+        self.fileListWidget.clear()
+        for imgPath, checked in zip(self.mImgList, done):
+            filename = os.path.basename(imgPath)
+            item = QListWidgetItem(doneicon if checked else closeicon, filename)
+            self.fileListWidget.addItem(item)
+
+    def dirRescanned(self, dirpath, signature, images):
+        """Replace the image list taken from the session snapshot if the directory changed"""
+        if dirpath != self.dirname:
+            return
+        self.dirSignature = signature
+        if images == self.mImgList:
+            return
+        logger.info("%s changed since the last session, refreshing the list", dirpath)
+        currIndex = self.currIndex
+        self.mImgList = images
+        self.fillFileList()
+        self.auto_recognition_num = len(images)
+        self.AutoRecognitionNum.setRange(0, len(images))
+        self.AutoRecognitionNum.setValue(self.auto_recognition_num)
+        if self.filePath in images:
+            self.currIndex = images.index(self.filePath)
+            self.mImgList5 = self.indexTo5Files(self.currIndex)
+        elif images:
+            # the open image is gone, show the one that took its place
+            self.filePath = None
+            self.currIndex = min(currIndex, len(images) - 1)
+            self.openNextImg(imgListCurrIndex=self.currIndex)
+        else:
+            self.filePath = None
+        self.fileListWidget.setCurrentRow(self.currIndex if images else -1)
+        self.fileDock.setWindowTitle(
+            self.fileListName
+            + f" ({self.fileListWidget.currentRow() + 1}/{self.fileListWidget.count()})"
+        )
+
+    def saveSession(self):
+        """Write the session snapshot of the open directory for the next start"""
+        if self.session is None or not self.mImgList:
+            return
+        current = fileSignature(self.dirname)
+        if current != self.dirSignature and set(self.listImages(self.dirname)) == set(
+            self.mImgList
+        ):
+            # only the label files were written, the list is still complete
+            self.dirSignature = current
+        try:
+            self.session.save(
+                self.mImgList,
+                self.img_list_natural_sort,
+                self.dirSignature,
+                [self.validFilestate(imgPath) is True for imgPath in self.mImgList],
+                fileSignature(self.fileStatepath),
+            )
+        except Exception as e:
+            logger.warning("Can not write the session snapshot: %s", e)
+
     def openPrevImg(self, _value=False):
         if len(self.mImgList) <= 0:
             return
@@ -2585,6 +2879,7 @@ class MainWindow(QMainWindow):
             self.mImgList5 = self.indexTo5Files(currIndex - 1)
             if filename:
                 self.loadFile(filename)
+                self.scheduleLookAhead(-1)
         if self.autoImportOption.isChecked():
             self.importhtml()
 
@@ -2615,9 +2910,86 @@ class MainWindow(QMainWindow):
         if filename:
             logger.debug("file name in openNext is %s", filename)
             self.loadFile(filename)
+            self.scheduleLookAhead(1)
         if self.autoImportOption.isChecked():
             self.importhtml()
 
+    def toggleLookAhead(self):
+        if self.lookAheadOption.isChecked():
+            if self.look_ahead_num <= 0:
+                self.look_ahead_num = 3
+            self.scheduleLookAhead(1)
+        else:
+            self.lookAhead.cancel()
+
+    def autotuneInference(self):
+        """
+        Benchmark the CPU inference settings on images of the open directory in the
+        background. The fastest is saved for this machine and used from the next start.
+        """
+        if self.autotuneWorker is not None and self.autotuneWorker.isRunning():
+            return
+        if not self.mImgList:
+            self.errorMessage(
+                "Autotune",
+                "请先打开图片目录" if self.lang == "ch" else "Open an image directory first",
+            )
+            return
+        cpu_keys = ("enable_mkldnn", "cpu_threads")
+        base_params = {k: v for k, v in self.ocr_params.items() if k not in cpu_keys}
+        self.autotuneWorker = AutotuneWorker(base_params, list(self.mImgList))
+        self.autotuneWorker.progress.connect(lambda msg: self.status(msg, 0))
+        self.autotuneWorker.failed.connect(
+            lambda error: self.errorMessage("Autotune", error)
+        )
+        self.autotuneWorker.tuned.connect(self.autotuneFinished)
+        self.status("推理参数调优中..." if self.lang == "ch" else "Autotuning inference...", 0)
+        self.autotuneWorker.start()
+
+    def autotuneFinished(self, best):
+        settings = "MKLDNN %s, %s threads, batch %d, %.2f images/s" % (
+            "on" if best["enable_mkldnn"] else "off",
+            best["cpu_threads"],
+            best["batch_size"],
+            best["images_per_second"],
+        )
+        if self.lang == "ch":
+            self.status("调优完成 (%s)，下次启动生效" % settings)
+        else:
+            self.status("Autotune saved %s, used from the next start" % settings)
+
+    def scheduleLookAhead(self, step):
+        """
+        Queue the next look_ahead_num images in the direction of navigation (step is +1 or -1)
+        that have no prediction yet. Images queued for the other direction are dropped.
+        """
+        if not self.lookAheadOption.isChecked() or self.autoRecRunning:
+            return
+        if self.loadedModel("ocr", wait=False) is None:
+            return
+        if not self.filePath or self.filePath not in self.mImgList:
+            return
+        index = self.mImgList.index(self.filePath)
+        targets = []
+        for i in range(1, self.look_ahead_num + 1):
+            j = index + step * i
+            if j < 0 or j >= len(self.mImgList):
+                break
+            img_path = self.mImgList[j]
+            if self.getImglabelidx(img_path) in self.PPlabel:
+                continue
+            if not self.validFilestate(img_path):
+                targets.append(img_path)
+        self.lookAheadDir = os.path.dirname(self.filePath)
+        self.lookAhead.schedule(targets)
+
+    def lookAheadResultReady(self, img_path, result_dic):
+        # drop results that arrive after the annotator switched to another directory
+        if os.path.dirname(img_path) != self.lookAheadDir:
+            return
+        self.autoRecResultReady(img_path, result_dic)
+        self.cacheLabelDirty = True
+
     def updateFileListIcon(self, filename):
         pass
 
@@ -2665,10 +3037,10 @@ class MainWindow(QMainWindow):
                 item = self.fileListWidget.item(currIndex)
                 item.setIcon(newIcon("done"))
 
-                self.fileStatedict[self.getImglabelidx(self.filePath)] = 1
+                self.fileStatedict[self.filePath] = 1
+                self.unjournaled.add(annotationFilePath)
                 if len(self.fileStatedict) % self.autoSaveNum == 0:
-                    self.saveFilestate()
-                    self.savePPlabel(mode="Auto")
+                    self.autoSaveLabels()
 
                 self.fileListWidget.insertItem(int(currIndex), item)
                 if not self.canvas.isInTheSameImage:
@@ -2679,6 +3051,7 @@ class MainWindow(QMainWindow):
 
         elif mode == "Auto":
             if annotationFilePath and self.saveLabels(annotationFilePath, mode=mode):
+                self.unjournaled.add(annotationFilePath)
                 self.setClean()
                 self.statusBar().showMessage("Saved to  %s" % annotationFilePath)
                 self.statusBar().show()
@@ -2726,11 +3099,12 @@ class MainWindow(QMainWindow):
                     logger.debug("Executing command: %s", " ".join(cmd))
                     subprocess.call(cmd, stdout=open(os.devnull, "w"))
 
-                if self.filePath in self.fileStatedict.keys():
+                if self.filePath in self.fileStatedict:
                     self.fileStatedict.pop(self.filePath)
                 imgidx = self.getImglabelidx(self.filePath)
                 if imgidx in self.PPlabel.keys():
                     self.PPlabel.pop(imgidx)
+                self.journalImage(imgidx)
 
                 self.importDirImages(self.lastOpenDir, isDelete=True)
 
@@ -2940,14 +3314,7 @@ class MainWindow(QMainWindow):
         return bbox
 
     def getImglabelidx(self, filePath):
-        if platform.system() == "Windows":
-            spliter = "\\"
-        else:
-            spliter = "/"
-        file_path_split = filePath.split(spliter)[-2:]
-        if len(file_path_split) == 1:
-            return filePath
-        return file_path_split[0] + "/" + file_path_split[1]
+        return imageKey(filePath)
 
     def autoRecognitionNum(self, value):
         remain_num = len(self.mImgList) - self.currIndex
@@ -2959,39 +3326,197 @@ class MainWindow(QMainWindow):
 
     def autoRecognition(self):
         assert self.mImgList is not None
+        if self.autoRecRunning:
+            self.autoDialog.show()
+            return
+        # worker processes build their own pipeline, only the in-process job needs it now
+        pool = self.getOcrPool()
+        ocr = None
+        if pool is None:
+            ocr = self.loadedModel("ocr")
+            if ocr is None:
+                return
         logger.info("Using model from %s", self.model)
 
         start_index = self.currIndex
         end_index = min(self.currIndex + self.auto_recognition_num, len(self.mImgList))
         images_to_check = self.mImgList[start_index:end_index]
 
-        recorded_basenames = [
-            os.path.basename(path)
-            for path in self.fileStatedict.keys()
-            if self.fileStatedict[path] == 1
-        ]
-
         uncheckedList = []
         for image_path in images_to_check:
             image_basename = os.path.basename(image_path)
-            if image_basename not in recorded_basenames:
+            if (
+                not self.fileStatedict.hasCheckedName(image_basename)
+                and self.getImglabelidx(image_path) not in self.autoRecDone
+            ):
                 uncheckedList.append(image_path)
 
+        # fold the journal of an interrupted run into Cache.cach before starting a new one
+        if self.autoRecJournal.exists():
+            self.saveCacheLabel()
+            self.autoRecJournal.remove()
+        self.autoRecJournal.begin([self.getImglabelidx(p) for p in uncheckedList])
+
         self.autoDialog = AutoDialog(
             parent=self,
-            ocr=self.ocr,
+            ocr=ocr,
             image_list=uncheckedList,
             len_bar=len(uncheckedList),
+            batch_size=self.auto_rec_batch_size,
+            pool=pool,
+            cache=self.predCache,
+            model_id=self.ocrModelId,
+            log_path=os.path.join(self.dirname, "autoRecognition.log"),
+            max_log_lines=self.auto_rec_log_lines,
+            det_max_side=self.det_max_side,
+            order=self.auto_rec_order,
+            priority_file=self.auto_rec_priority_file,
         )
+        self.autoDialog.thread_1.resultValue.connect(self.autoRecResultReady)
+        self.autoDialog.jobFinished.connect(self.autoRecognitionFinished)
+        # the look-ahead thread shares the OCR pipeline, let the job have it alone
+        self.lookAhead.cancel(wait=True)
+        self.autoRecRunning = True
+        self.AutoRecognition.setEnabled(False)
+        self.actions.AutoRec.setEnabled(False)
         self.autoDialog.popUp()
+
+    def autoRecResultReady(self, img_path, result_dic):
+        """Store one auto recognition result, runs in the GUI thread"""
+        key = self.getImglabelidx(img_path)
+        label = []
+        for box in result_dic or []:
+            if box[1][0] == "":
+                continue
+            trans_dict = {
+                "transcription": box[1][0],
+                "points": box[0],
+                "difficult": False,
+            }
+            if self.kie_mode:
+                trans_dict.update({"key_cls": "None"})
+            label.append(trans_dict)
+        if label:
+            self.Cachelabel[key] = label
+            # never overwrite an image the annotator checked while the job was running
+            if not self.validFilestate(img_path):
+                self.PPlabel[key] = label
+        if self.autoRecRunning:
+            self.autoRecJournal.append(key, label or None)
+
+        # show the new boxes at once if the annotator is looking at this image
+        if label and img_path == self.filePath and not self.dirty:
+            self.loadFile(self.filePath, isAdjustScale=False)
+
+    def autoRecognitionFinished(self):
+        if not self.autoRecRunning:
+            return
+        self.autoRecRunning = False
         self.haveAutoReced = True
-        self.filePath = self.mImgList[self.currIndex]
-        self.loadFile(self.filePath, isAdjustScale=False)
+        # compact the journal, results of a cancelled run are kept as well
         self.saveCacheLabel()
+        self.autoRecJournal.remove()
+        self.autoRecDone = set()
 
         self.init_key_list(self.Cachelabel)
+        self.AutoRecognition.setEnabled(True)
+        self.actions.AutoRec.setEnabled(True)
+
+    def stopAutoRecognition(self):
+        """Cancel a running background job and process the results it already delivered"""
+        if self.autoRecRunning:
+            self.autoDialog.reject()
+            # results of the images in flight still belong to the current folder
+            self.autoDialog.thread_1.wait()
+            QApplication.processEvents()
+
+    def replayAutoRecJournal(self, dirpath):
+        """
+        Load the results of an auto recognition run that was interrupted in dirpath into
+        Cachelabel. Returns the keys of the planned images that were not processed yet.
+        """
+        self.autoRecJournal = AutoRecJournal(dirpath + "/Cache.cach.journal")
+        self.autoRecDone = set()
+        if not self.autoRecJournal.exists():
+            return []
+        plan, results = self.autoRecJournal.replay()
+        for key, label in results.items():
+            if label:
+                self.Cachelabel[key] = label
+        self.autoRecDone = set(results)
+        remaining = [key for key in plan if key not in results]
+        logger.info(
+            "Resume auto recognition in %s: %d of %d images left",
+            dirpath,
+            len(remaining),
+            len(plan),
+        )
+        return remaining
+
+    def getOcrPool(self):
+        """
+        Process pool used by auto recognition when more than one worker is configured.
+        The pool is kept between runs and rebuilt after it was cancelled or the model changed.
+        """
+        if self.auto_rec_workers <= 1:
+            return None
+        if self.ocrPool is None or self.ocrPool.closed:
+            cpu_threads = self.auto_rec_threads_per_worker
+            if cpu_threads is None and self.inferenceProfile["cpu_threads"]:
+                # the profile's threads are shared by the workers
+                cpu_threads = max(
+                    1, self.inferenceProfile["cpu_threads"] // self.auto_rec_workers
+                )
+            self.ocrPool = OCRProcessPool(
+                self.ocr_params,
+                self.auto_rec_workers,
+                cpu_threads=cpu_threads,
+                cache=self.predCache,
+                det_max_side=self.det_max_side,
+                backend=None if self.models else self.backend,
+            )
+        return self.ocrPool
+
+    def recognizeCrop(self, img_crop):
+        """Recognise the text of one box crop, served from the prediction cache when possible"""
+        key = None
+        if self.predCache is not None:
+            key = self.predCache.makeKey(
+                np.ascontiguousarray(img_crop), self.recModelId
+            )
+            cached = self.predCache.get(key)
+            if cached is not None:
+                return cached
+        result = self.backend.recognize(img_crop)
+        if key is not None:
+            self.predCache.put(key, result)
+        return result
+
+    def predictTable(self, img, img_data):
+        """
+        Run table recognition on a decoded image, img_data is the raw file content used as
+        the cache key. The backend result holds only the fields TableRecognition uses.
+        """
+        key = None
+        if self.predCache is not None:
+            key = self.predCache.makeKey(img_data, self.tableModelId)
+            cached = self.predCache.get(key)
+            if cached is not None:
+                return cached
+        start = time.time()
+        res = self.backend.table(img, self.det_max_side)
+        reportDownscale(
+            "Table recognition", [img.shape], self.det_max_side, time.time() - start
+        )
+        if res is None:
+            return None
+        if key is not None:
+            self.predCache.put(key, res)
+        return res
 
     def reRecognition(self):
+        if self.loadedModel("rec") is None:
+            return
         img = cv2.imdecode(np.fromfile(self.filePath, dtype=np.uint8), 1)
         if self.canvas.shapes:
             self.result_dic = []
@@ -3016,7 +3541,7 @@ class MainWindow(QMainWindow):
                     )
                     QMessageBox.information(self, "Information", msg)
                     return
-                result = self.text_recognizer.predict(img_crop)[0]
+                result = self.recognizeCrop(img_crop)
                 storage = [(result["rec_text"], result["rec_score"])]
                 if result["rec_text"] != "":
                     if shape.line_color == DEFAULT_LOCK_COLOR:
@@ -3076,6 +3601,8 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "Information", "Draw a box!")
 
     def singleRerecognition(self):
+        if self.loadedModel("rec") is None:
+            return
         img = cv2.imdecode(np.fromfile(self.filePath, dtype=np.uint8), 1)
         for shape in self.canvas.selectedShapes:
             box = [[int(p.x()), int(p.y())] for p in shape.points]
@@ -3091,7 +3618,7 @@ class MainWindow(QMainWindow):
                 )
                 QMessageBox.information(self, "Information", msg)
                 return
-            result = self.text_recognizer.predict(img_crop)[0]
+            result = self.recognizeCrop(img_crop)
             storage = [(result["rec_text"], result["rec_score"])]
             if result["rec_text"] != "":
                 storage.insert(0, box)
@@ -3118,11 +3645,12 @@ class MainWindow(QMainWindow):
         """
         from tablepyxl import tablepyxl
 
-        import time
-
+        if self.loadedModel("table") is None:
+            return
         start = time.time()
-        img = cv2.imdecode(np.fromfile(self.filePath, dtype=np.uint8), cv2.IMREAD_COLOR)
-        res = self.table_ocr.predict(img)[0]
+        img_data = np.fromfile(self.filePath, dtype=np.uint8)
+        img = cv2.imdecode(img_data, cv2.IMREAD_COLOR)
+        res = self.predictTable(img, img_data)
 
         table_rec_excel_dir = self.lastOpenDir + "/tableRec_excel_output/"
         os.makedirs(table_rec_excel_dir, exist_ok=True)
@@ -3223,6 +3751,8 @@ class MainWindow(QMainWindow):
             try:
                 tablepyxl.document_to_xl("", excel_path)
             except AttributeError:  # 如果 tablepyxl 报错，改用 openpyxl
+                import openpyxl
+
                 wb = openpyxl.Workbook()
                 wb.save(excel_path)
             return
@@ -3261,6 +3791,8 @@ class MainWindow(QMainWindow):
         """
         re-recognise text in a cell
         """
+        if self.loadedModel("det") is None or self.loadedModel("rec") is None:
+            return
         img = cv2.imdecode(np.fromfile(self.filePath, dtype=np.uint8), cv2.IMREAD_COLOR)
         for shape in self.canvas.selectedShapes:
             box = [[int(p.x()), int(p.y())] for p in shape.points]
@@ -3284,13 +3816,12 @@ class MainWindow(QMainWindow):
             # merge the text result in the cell
             texts = ""
             probs = 0.0  # the probability of the cell is average prob of every text box in the cell
-            det_res = self.text_detector.predict(img_crop)[0]
-            bboxes = det_res["dt_polys"].tolist()
+            bboxes = self.backend.detect(img_crop)
             if len(bboxes) > 0:
                 bboxes.reverse()  # top row text at first
                 for _bbox in bboxes:
                     patch = get_rotate_crop_image(img_crop, np.array(_bbox, np.float32))
-                    rec_res = self.text_recognizer.predict(patch)[0]
+                    rec_res = self.backend.recognize(patch)
                     text = rec_res["rec_text"]
                     if text != "":
                         texts += text + (
@@ -3322,27 +3853,20 @@ class MainWindow(QMainWindow):
         """
 
         # automatically save annotations
-        self.saveFilestate()
-        self.savePPlabel(mode="auto")
+        self.saveAnnotations(mode="auto")
 
         # load box annotations
-        labeldict = {}
         if not os.path.exists(self.PPlabelpath):
             msg = "ERROR, Can not find Label.txt"
             QMessageBox.information(self, "Information", msg)
             return
+        elif isinstance(self.PPlabel, LazyLabels):
+            # only the images that have a table are parsed
+            labeldict = self.PPlabel.base
         else:
-            with open(self.PPlabelpath, "r", encoding="utf-8") as f:
-                data = f.readlines()
-                for each in data:
-                    file, label = each.split("\t")
-                    if label:
-                        label = label.replace("false", "False")
-                        label = label.replace("true", "True")
-                        label = label.replace("null", "None")
-                        labeldict[file] = eval(label)
-                    else:
-                        labeldict[file] = []
+            labeldict = readLabelFile(self.PPlabelpath)
+
+        import openpyxl
 
         # read table recognition output
         TableRec_excel_dir = os.path.join(self.lastOpenDir, "tableRec_excel_output")
@@ -3427,38 +3951,9 @@ class MainWindow(QMainWindow):
     def modelChoose(self):
         current_text = self.comboBox.currentText()
         logger.debug("Model selected: %s", current_text)
-        lg_idx = {
-            "Chinese & English": "ch",
-            "English": "en",
-            "French": "french",
-            "German": "german",
-            "Korean": "korean",
-            "Japanese": "japan",
-        }
-        if current_text in lg_idx:
-            choose_lang = lg_idx[current_text]
-            if hasattr(self, "ocr"):
-                del self.ocr
-                self.ocr = PaddleOCR(
-                    use_doc_orientation_classify=False,
-                    use_textline_orientation=False,
-                    use_doc_unwarping=False,
-                    lang=choose_lang,
-                    device=self.gpu,
-                )
-            if choose_lang in ["ch", "en"]:
-                if hasattr(self, "table_ocr"):
-                    del self.table_ocr
-                self.table_ocr = PPStructureV3(
-                    use_doc_orientation_classify=False,
-                    use_doc_unwarping=False,
-                    use_seal_recognition=False,
-                    use_table_recognition=True,
-                    use_formula_recognition=False,
-                    use_chart_recognition=False,
-                    use_region_detection=False,
-                    device=self.gpu,
-                )
+        if current_text in MODEL_LANGUAGES:
+            choose_lang = MODEL_LANGUAGES[current_text]
+            self.switchOcrPipeline(self.languageParams(choose_lang))
         else:
             logger.error("Invalid language selection")
         self.dialog.close()
@@ -3466,53 +3961,384 @@ class MainWindow(QMainWindow):
     def cancel(self):
         self.dialog.close()
 
+    def switchOcrPipeline(self, params, predictors=False):
+        """
+        Make the OCR pipeline for params the current one, predictors=True also replaces
+        the standalone det/rec models. The table model does not depend on either.
+        """
+        old_key = ModelRegistry.makeKey("ocr", **self.ocr_params)
+        self.ocr_params = params
+        if predictors:
+            self.recModelId = self.recognizerIdentity()
+        self.ocrModelId = pipelineIdentity(
+            "ocr", dict(self.ocr_params, det_max_side=self.det_max_side)
+        )
+        self.describeCachedModels()
+        if self.ocrPool is not None:
+            self.ocrPool.terminate()
+        if not self.models:
+            # a backend without models to load takes the new parameters as they are
+            self.lookAhead.setModel(self.backend, self.ocrModelId)
+            return
+        # pinned before the old one is released, so the budget never drops the target
+        self.models["ocr"] = self.newOcrModel()
+        if old_key != ModelRegistry.makeKey("ocr", **self.ocr_params):
+            # the old pipeline stays cached until the memory budget needs its room
+            MODEL_REGISTRY.unpin(old_key)
+        if predictors:
+            self.models.update(self.newPredictorModels())
+        self.lookAhead.setModel(None, self.ocrModelId)
+        if ModelRegistry.makeKey("ocr", **self.ocr_params) in MODEL_REGISTRY:
+            # a recently used pipeline, switching back is instant
+            self.models["ocr"].get()
+            self.modelLoaded(self.models["ocr"])
+        self.loadModelsInBackground()
+
+    def setSpeedProfile(self, name):
+        if name == self.speed_profile:
+            return
+        self.speed_profile = name
+        logger.info("Speed profile %s", name)
+        if "text_recognition_model_name" in self.ocr_params:
+            params = self.defaultOcrParams()
+        else:
+            # a pipeline chosen in the model dialog keeps its language
+            params = self.languageParams(self.ocr_params["lang"])
+        self.switchOcrPipeline(params, predictors=True)
+        self.status(
+            ("速度模式: %s" if self.lang == "ch" else "Speed profile: %s")
+            % modelSummary(self.ocr_params)
+        )
+
+    def defaultOcrParams(self):
+        """Parameters of the OCR pipeline loaded at startup"""
+        params = {
+            "use_doc_orientation_classify": False,
+            "use_doc_unwarping": False,
+            "device": self.gpu,
+            "lang": self.lang,
+            **SPEED_PROFILES[self.speed_profile],
+            **self.inferenceParams(),
+        }
+        params.update((k, v) for k, v in self.model_dirs.items() if v is not None)
+        return params
+
+    def newPredictorModels(self):
+        """
+        LazyModels of the standalone det and rec predictors of the speed profile, det is
+        built on first use, see onDemandModels
+        """
+        profile = SPEED_PROFILES[self.speed_profile]
+        models = {}
+        for name, kind, class_name, prefix in (
+            ("text recognition", "rec", "TextRecognition", "text_recognition"),
+            ("text detection", "det", "TextDetection", "text_detection"),
+        ):
+            models[kind] = LazyModel(
+                name,
+                partial(
+                    self.sharedPredictor,
+                    kind,
+                    class_name,
+                    model_name=profile[prefix + "_model_name"],
+                    model_dir=self.model_dirs[prefix + "_model_dir"],
+                    device=self.gpu,
+                    **self.inferenceParams(),
+                ),
+            )
+        return models
+
+    def recognizerIdentity(self):
+        return pipelineIdentity(
+            "rec",
+            {
+                "text_recognition_model_name": SPEED_PROFILES[self.speed_profile][
+                    "text_recognition_model_name"
+                ],
+                "text_recognition_model_dir": self.model_dirs[
+                    "text_recognition_model_dir"
+                ],
+            },
+        )
+
+    def describeCachedModels(self):
+        """Record the speed profile behind the current model ids in the prediction cache"""
+        if self.predCache is None:
+            return
+        description = "%s speed profile, %s" % (
+            self.speed_profile,
+            modelSummary(self.ocr_params),
+        )
+        self.predCache.describeModel(self.ocrModelId, description)
+        self.predCache.describeModel(
+            self.recModelId,
+            "%s speed profile, %s"
+            % (
+                self.speed_profile,
+                SPEED_PROFILES[self.speed_profile]["text_recognition_model_name"],
+            ),
+        )
+
+    def languageParams(self, lang):
+        """
+        Parameters of the OCR pipeline loaded when lang is chosen in the model dialog.
+        The recognition model follows lang, detection follows the speed profile.
+        """
+        return {
+            "use_doc_orientation_classify": False,
+            "use_textline_orientation": False,
+            "use_doc_unwarping": False,
+            "lang": lang,
+            "device": self.gpu,
+            "text_detection_model_name": SPEED_PROFILES[self.speed_profile][
+                "text_detection_model_name"
+            ],
+            **self.inferenceParams(),
+        }
+
+    def inferenceParams(self):
+        """
+        CPU settings of the inference profile passed to every paddle model, those the
+        profile leaves to paddle (None) are not passed
+        """
+        profile = self.inferenceProfile
+        return {
+            key: profile[key]
+            for key in ("enable_mkldnn", "cpu_threads")
+            if profile[key] is not None
+        }
+
+    def newOcrModel(self, params=None, pin=True):
+        """
+        LazyModel of the OCR pipeline for params, the current ocr_params by default.
+        The pipeline of the current language is pinned so the memory budget never drops it.
+        """
+        params = dict(params or self.ocr_params)
+        key = ModelRegistry.makeKey("ocr", **params)
+        if pin:
+            MODEL_REGISTRY.pin(key)
+        return LazyModel(
+            "OCR pipeline",
+            partial(self.buildOcrPipeline, params),
+            # a cached pipeline was warmed up when it was built
+            None if key in MODEL_REGISTRY else WARMUP_IMAGE,
+        )
+
+    def newTableModel(self):
+        return LazyModel(
+            "table recognition",
+            partial(
+                MODEL_REGISTRY.get,
+                ModelRegistry.makeKey("table", device=self.gpu),
+                self.buildTableModel,
+                "table recognition",
+            ),
+            WARMUP_IMAGE,
+        )
+
+    def buildTableModel(self):
+        from paddleocr import PPStructureV3
+
+        return PPStructureV3(
+            use_doc_orientation_classify=False,
+            use_doc_unwarping=False,
+            use_seal_recognition=False,
+            use_table_recognition=True,
+            use_formula_recognition=False,
+            use_chart_recognition=False,
+            use_region_detection=False,
+            device=resolveDevice(self.gpu),
+            **self.inferenceParams(),
+        )
+
+    def buildOcrPipeline(self, params):
+        from paddleocr import PaddleOCR
+
+        key = ModelRegistry.makeKey("ocr", **params)
+        ocr = MODEL_REGISTRY.get(
+            key,
+            partial(buildModel, PaddleOCR, params),
+            "OCR pipeline (%s)" % params["lang"],
+            evictable=True,
+        )
+        # re-recognition uses the recognizer of the pipeline instead of a second copy
+        for kind, predictor in pipelinePredictors(ocr).items():
+            predictor_key = self.pipelinePredictorKey(kind, params)
+            if predictor_key is not None:
+                MODEL_REGISTRY.share(predictor_key, predictor, key, predictor_key[0])
+        return ocr
+
+    @staticmethod
+    def pipelinePredictorKey(kind, params):
+        """
+        Registry key of the rec predictor inside an OCR pipeline built from params, None
+        for det, whose pipeline settings differ from a standalone TextDetection.
+        """
+        if kind != "rec":
+            return None
+        model_name = params.get("text_recognition_model_name")
+        if model_name is None:
+            # the pipeline picks the model from lang
+            return None
+        return ModelRegistry.makeKey(
+            kind,
+            model_name=model_name,
+            model_dir=params.get("text_recognition_model_dir"),
+            device=params.get("device"),
+            enable_mkldnn=params.get("enable_mkldnn"),
+            cpu_threads=params.get("cpu_threads"),
+        )
+
+    def sharedPredictor(self, kind, class_name, **config):
+        """
+        The det or rec predictor for config, class_name is the paddleocr predictor class.
+        When the OCR pipeline is configured with the same rec model, the pipeline is loaded
+        first and its own recognizer is handed out.
+        """
+        import paddleocr
+
+        factory = getattr(paddleocr, class_name)
+        key = ModelRegistry.makeKey(kind, **config)
+        if key not in MODEL_REGISTRY and key == self.pipelinePredictorKey(
+            kind, self.ocr_params
+        ):
+            self.models["ocr"].get()
+        return MODEL_REGISTRY.get(key, partial(buildModel, factory, config), kind)
+
+    def backgroundModels(self):
+        """The models loaded in the background, all but the ones built on first use"""
+        return [
+            model
+            for name, model in self.models.items()
+            if name not in self.onDemandModels
+        ]
+
+    def loadModelsInBackground(self):
+        models = self.backgroundModels()
+        if not all(model.ready for model in models):
+            self.status("模型加载中..." if self.lang == "ch" else "Loading models...", 0)
+        # preloaded languages come after the models of the current one
+        self.modelLoader.load(models + self.preloadModels)
+
+    def loadedModel(self, name, wait=True):
+        """
+        The inference backend if the model it needs for name ("ocr", "det", "rec" or
+        "table") is built. Otherwise the background loader is asked to build it next and,
+        unless wait is False, a loading message is shown, so the UI never blocks.
+        """
+        model = self.models.get(name)
+        if model is None or model.ready:
+            # backends without models to load, like the stub, are always ready
+            return self.backend
+        if not wait:
+            return None
+        self.modelLoader.load([model], first=True)
+        if self.lang == "ch":
+            msg = "模型加载中，请稍后再试"
+        else:
+            msg = "The %s model is still loading, please try again shortly" % model.name
+        self.status(msg)
+        return None
+
+    def modelLoaded(self, model):
+        if model in self.preloadModels:
+            # the registry keeps the pipeline, the budget may drop it later
+            self.preloadModels.remove(model)
+        if model is self.models["ocr"]:
+            self.lookAhead.setModel(self.backend, self.ocrModelId)
+        if all(m.ready for m in self.backgroundModels()):
+            report = MODEL_REGISTRY.memoryReport()
+            logger.info("Model memory: %s", "; ".join(report))
+            self.status(
+                ("模型加载完成: " if self.lang == "ch" else "Models loaded: ")
+                + ", ".join(report),
+                0,
+            )
+
+    def startupFinished(self):
+        if STARTUP_PROFILER.finished:
+            return
+        STARTUP_PROFILER.finish()
+        if self.profile_startup:
+            try:
+                STARTUP_PROFILER.write(self.profile_startup)
+            except OSError as e:
+                logger.error("Can not write startup profile: %s", e)
+
+    def modelFailed(self, model, error):
+        if model in self.preloadModels:
+            self.preloadModels.remove(model)
+        self.status("Can not load the %s model: %s" % (model.name, error), 0)
+
     def loadFilestate(self, saveDir):
         self.fileStatepath = saveDir + "/fileState.txt"
-        self.fileStatedict = {}
+        states = self.session.labelFile(self.fileStatepath)
+        if states is not None:
+            self.fileStatedict = StatusIndex(states)
+            self.actions.saveLabel.setEnabled(True)
+            self.actions.saveRec.setEnabled(True)
+            self.actions.exportJSON.setEnabled(True)
+            return
+        self.fileStatedict = StatusIndex()
         if not os.path.exists(self.fileStatepath):
-            f = open(self.fileStatepath, "w", encoding="utf-8")
+            open(self.fileStatepath, "w", encoding="utf-8").close()
         else:
             with open(self.fileStatepath, "r", encoding="utf-8") as f:
                 states = f.readlines()
                 for each in states:
                     file, state = each.split("\t")
-                    self.fileStatedict[self.getImglabelidx(file)] = 1
+                    self.fileStatedict[file] = 1
                 self.actions.saveLabel.setEnabled(True)
                 self.actions.saveRec.setEnabled(True)
                 self.actions.exportJSON.setEnabled(True)
+        self.session.rememberLabelFile(self.fileStatepath, self.fileStatedict)
 
     def saveFilestate(self):
-        with open(self.fileStatepath, "w", encoding="utf-8") as f:
-            for key in self.fileStatedict:
-                f.write(key + "\t")
-                f.write(str(self.fileStatedict[key]) + "\n")
-
-    def loadLabelFile(self, labelpath):
+        writeStateFile(self.fileStatepath, self.fileStatedict)
+        self.session.rememberLabelFile(self.fileStatepath, self.fileStatedict)
+
+    def loadLabelFile(self, labelpath, lazy=False):
+        if lazy and isLargeLabelFile(labelpath):
+            # records of a large file are parsed when an image is shown or exported
+            logger.info("Reading %s lazily", labelpath)
+            return LazyLabels(LabelFileIndex(labelpath))
+        labeldict = self.session.labelFile(labelpath)
+        if labeldict is not None:
+            return labeldict
         labeldict = {}
         if not os.path.exists(labelpath):
-            f = open(labelpath, "w", encoding="utf-8")
-
+            open(labelpath, "w", encoding="utf-8").close()
         else:
-            with open(labelpath, "r", encoding="utf-8") as f:
-                data = f.readlines()
-                for each in data:
-                    file, label = each.split("\t")
-                    if label:
-                        label = label.replace("false", "False")
-                        label = label.replace("true", "True")
-                        label = label.replace("null", "None")
-                        labeldict[file] = eval(label)
-                    else:
-                        labeldict[file] = []
+            labeldict = readLabelFile(labelpath)
+        self.session.rememberLabelFile(labelpath, labeldict)
         return labeldict
 
+    def checkedLabels(self):
+        """
+        Content of Label.txt: the non-empty annotations of the checked images, and the lines
+        of the file that could not be parsed
+        """
+        return LabelDict(
+            (
+                (key, label)
+                for key, label in self.PPlabel.items()
+                if key in self.fileStatedict and label != []
+            ),
+            unparsed=getattr(self.PPlabel, "unparsed", ()),
+        )
+
     def savePPlabel(self, mode="Manual"):
-        savedfile = [self.getImglabelidx(i) for i in self.fileStatedict.keys()]
-        with open(self.PPlabelpath, "w", encoding="utf-8") as f:
-            for key in self.PPlabel:
-                if key in savedfile and self.PPlabel[key] != []:
-                    f.write(key + "\t")
-                    f.write(json.dumps(self.PPlabel[key], ensure_ascii=False) + "\n")
+        if isinstance(self.PPlabel, LazyLabels):
+            # unchanged records are copied from the old file without being parsed
+            self.PPlabel.writeFile(
+                key
+                for key in self.PPlabel
+                if key in self.fileStatedict and not self.PPlabel.isEmpty(key)
+            )
+        else:
+            written = self.checkedLabels()
+            writeLabelFile(self.PPlabelpath, written)
+            self.session.rememberLabelFile(self.PPlabelpath, written)
 
         if mode == "Manual":
             if self.lang == "ch":
@@ -3522,14 +4348,119 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "Information", msg)
 
     def saveCacheLabel(self):
-        with open(self.Cachelabelpath, "w", encoding="utf-8") as f:
-            for key in self.Cachelabel:
-                f.write(key + "\t")
-                f.write(json.dumps(self.Cachelabel[key], ensure_ascii=False) + "\n")
+        if self.annotationStore is not None:
+            self.annotationStore.replace("cache", self.Cachelabel)
+        # written aside and swapped, a crash never leaves a half written Cache.cach
+        writeLabelFile(self.Cachelabelpath, self.Cachelabel)
+        self.session.rememberLabelFile(self.Cachelabelpath, self.Cachelabel)
+        if self.annotationStore is not None:
+            self.annotationStore.markExported("cache", self.Cachelabelpath)
+
+    def openAnnotationStore(self, dirpath):
+        """
+        Load the annotations of dirpath from its annotations.db. Label files changed by
+        other tools since the store last wrote or read them are imported first.
+        Returns True if the store has check states that fileState.txt does not have yet.
+        """
+        if self.annotationStore is not None:
+            self.annotationStore.close()
+        self.annotationJournal = None
+        self.fileStatepath = dirpath + "/fileState.txt"
+        self.PPlabelpath = dirpath + "/Label.txt"
+        self.Cachelabelpath = dirpath + "/Cache.cach"
+        self.annotationStore = AnnotationStore(dirpath + "/annotations.db")
+        for name, path in (
+            ("state", self.fileStatepath),
+            ("label", self.PPlabelpath),
+            ("cache", self.Cachelabelpath),
+        ):
+            if self.annotationStore.needsImport(name, path):
+                count = self.annotationStore.importFile(name, path)
+                logger.info("Imported %d lines of %s into the store", count, path)
+        self.fileStatedict = StatusIndex(
+            (key, 1) for key in self.annotationStore.load("state")
+        )
+        self.PPlabel = self.annotationStore.load("label")
+        self.Cachelabel = self.annotationStore.load("cache")
+        if self.fileStatedict:
+            self.actions.saveLabel.setEnabled(True)
+            self.actions.saveRec.setEnabled(True)
+            self.actions.exportJSON.setEnabled(True)
+        return self.annotationStore.isDirty("state")
+
+    def imageEntries(self, key):
+        """The fileState.txt and Label.txt values of key, None where it has no line"""
+        state = self.fileStatedict.get(key)
+        label = self.PPlabel.get(key) if state is not None else None
+        return state, label or None
+
+    def journalImage(self, key):
+        """Save the current entries of key to the journal or the annotation store"""
+        state, label = self.imageEntries(key)
+        if self.annotationStore is not None:
+            self.annotationStore.put("state", key, state)
+            self.annotationStore.put("label", key, label)
+        else:
+            self.annotationJournal.append(key, state, label)
 
-    def saveLabelFile(self):
+    def autoSaveLabels(self):
+        """
+        Save the images changed since the last auto save. They are upserted into the
+        annotation store, or appended to the journal, which is folded into Label.txt and
+        fileState.txt in the background once it is long.
+        """
+        if self.annotationStore is not None:
+            entries = [(key,) + self.imageEntries(key) for key in self.unjournaled]
+            self.annotationStore.putMany("state", [(k, s) for k, s, _ in entries])
+            self.annotationStore.putMany("label", [(k, l) for k, _, l in entries])
+            self.unjournaled = set()
+            return
+        for key in self.unjournaled:
+            self.journalImage(key)
+        self.unjournaled = set()
+        if not self.annotationJournal.needsCompaction() or isinstance(
+            self.PPlabel, LazyLabels
+        ):
+            # a lazily read Label.txt is only rewritten by full saves
+            return
+        states = dict(self.fileStatedict)
+        labels = self.checkedLabels()
+        statepath, labelpath, session = (
+            self.fileStatepath,
+            self.PPlabelpath,
+            self.session,
+        )
+
+        def write():
+            writeStateFile(statepath, states)
+            session.rememberLabelFile(statepath, states)
+            writeLabelFile(labelpath, labels)
+            session.rememberLabelFile(labelpath, labels)
+
+        self.annotationJournal.compact(write)
+
+    def saveAnnotations(self, mode="Manual"):
+        """Write fileState.txt and Label.txt in full, which makes the journal obsolete"""
+        if self.annotationJournal is not None:
+            self.annotationJournal.wait()
+        if self.annotationStore is not None:
+            self.annotationStore.replace("state", self.fileStatedict)
+            self.annotationStore.replace("label", self.checkedLabels())
         self.saveFilestate()
-        self.savePPlabel()
+        self.savePPlabel(mode=mode)
+        self.unjournaled = set()
+        if self.annotationJournal is not None:
+            self.annotationJournal.reset()
+        if self.annotationStore is not None:
+            self.annotationStore.markExported("state", self.fileStatepath)
+            self.annotationStore.markExported("label", self.PPlabelpath)
+
+    def saveLabelFile(self):
+        self.saveAnnotations()
+        if self.cacheLabelDirty:
+            # keep the look-ahead predictions in Cache.cach
+            self.saveCacheLabel()
+            self.cacheLabelDirty = False
 
     def saveRecResult(self):
         if {} in [self.PPlabelpath, self.PPlabel, self.fileStatedict]:
@@ -3793,6 +4724,8 @@ class MainWindow(QMainWindow):
         )
 
     def importhtml(self):
+        from tablepyxl import tablepyxl
+
         if not self.dict_html:
             parent_dir = os.path.dirname(self.lastOpenDir)
             self.htmlfile_path = os.path.join(parent_dir, "val_html.txt")
@@ -3813,6 +4746,8 @@ class MainWindow(QMainWindow):
         os.system("open " + os.path.normpath(open_excel_path))
 
     def exporthtml(self):
+        from tablepyxl import tablepyxl
+
         parent_directory = os.path.dirname(self.htmlfile_path)
         new_directory = os.path.join(parent_directory, "backup")
         current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -3869,6 +4804,7 @@ def get_main_app(argv=[]):
     app = QApplication(argv)
     app.setApplicationName(__appname__)
     app.setWindowIcon(newIcon("app"))
+    STARTUP_PROFILER.mark("Qt init")
     # Tzutalin 201705+: Accept extra arguments to change predefined class file
     arg_parser = argparse.ArgumentParser()
     arg_parser.add_argument("--lang", type=str, default="ch", nargs="?")
@@ -3899,8 +4835,150 @@ def get_main_app(argv=[]):
         nargs="?",
         help='An RGB value as "R,G,B".',
     )
+    arg_parser.add_argument(
+        "--auto_rec_batch_size",
+        type=int,
+        default=None,
+        nargs="?",
+        help="Number of images passed to the OCR pipeline at once in auto recognition, "
+        "the inference profile decides by default.",
+    )
+    arg_parser.add_argument(
+        "--auto_rec_workers",
+        type=int,
+        default=1,
+        nargs="?",
+        help="Number of processes used by auto recognition, each loads its own models.",
+    )
+    arg_parser.add_argument(
+        "--auto_rec_threads_per_worker",
+        type=int,
+        default=None,
+        nargs="?",
+        help="CPU threads used by each auto recognition process.",
+    )
+    arg_parser.add_argument(
+        "--pred_cache_dir",
+        type=str,
+        default=None,
+        nargs="?",
+        help="Directory of the prediction cache, ~/.PPOCRLabel/pred_cache by default.",
+    )
+    arg_parser.add_argument(
+        "--pred_cache_size_mb",
+        type=float,
+        default=1024,
+        nargs="?",
+        help="Size limit of the prediction cache in MB, 0 disables it.",
+    )
+    arg_parser.add_argument(
+        "--look_ahead_num",
+        type=int,
+        default=0,
+        nargs="?",
+        help="Recognise this many upcoming images in the background while reviewing, 0 is off.",
+    )
+    arg_parser.add_argument(
+        "--auto_rec_log_lines",
+        type=int,
+        default=1000,
+        nargs="?",
+        help="Lines kept in the auto recognition dialog, the full log is in autoRecognition.log.",
+    )
+    arg_parser.add_argument(
+        "--det_max_side",
+        type=int,
+        default=0,
+        nargs="?",
+        help="Shrink images so the longer side is at most this before text detection, "
+        "boxes are mapped back and recognised at full resolution. 0 is off.",
+    )
+    arg_parser.add_argument(
+        "--auto_rec_order",
+        type=str,
+        default="list",
+        choices=ORDER_POLICIES,
+        help="Order of auto recognition: file list order, smallest images first, "
+        "or the order of --auto_rec_priority_file.",
+    )
+    arg_parser.add_argument(
+        "--auto_rec_priority_file",
+        type=str,
+        default=None,
+        help="Text file with one image path or file name per line, recognised first "
+        "when --auto_rec_order is priority.",
+    )
+    arg_parser.add_argument(
+        "--model_memory_mb",
+        type=float,
+        default=3072,
+        help="Memory kept for the OCR pipelines of recently used languages, the least "
+        "recently used ones are dropped beyond it. 0 keeps only the current language.",
+    )
+    arg_parser.add_argument(
+        "--preload_langs",
+        type=str,
+        default="",
+        help="Comma separated languages to load at startup, e.g. ch,en,japan. "
+        "Choices: " + ",".join(MODEL_LANGUAGES.values()),
+    )
+    arg_parser.add_argument(
+        "--profile_startup",
+        "--profile-startup",
+        type=str,
+        nargs="?",
+        const="-",
+        default=None,
+        help="Time the startup phases, print a table or write JSON to the given file "
+        "once all models are loaded.",
+    )
+    arg_parser.add_argument(
+        "--inference_profile",
+        type=str,
+        default="auto",
+        choices=PROFILE_NAMES,
+        help="CPU inference settings: latency, throughput, low-memory, default, or the "
+        "profile saved by autotune (tuned). auto uses tuned when there is one.",
+    )
+    arg_parser.add_argument(
+        "--inference_backend",
+        type=str,
+        default="paddle",
+        choices=BACKEND_NAMES,
+        help="Engine behind all recognition features. stub needs no model weights and "
+        "returns deterministic fake results, for benchmarks and load tests.",
+    )
+    arg_parser.add_argument(
+        "--stub_latency_ms",
+        type=float,
+        default=0,
+        help="Time the stub backend sleeps per call to stand in for a model.",
+    )
+    arg_parser.add_argument(
+        "--annotation_store",
+        type=str,
+        default="text",
+        choices=("text", "sqlite"),
+        help="Where confirmed annotations are saved. sqlite keeps them in "
+        "annotations.db of the image directory and writes Label.txt, Cache.cach and "
+        "fileState.txt on close and manual saves only.",
+    )
+    arg_parser.add_argument(
+        "--speed_profile",
+        type=str,
+        default="server",
+        choices=tuple(SPEED_PROFILES),
+        help="Models of auto recognition and re-recognition: server is the most "
+        "accurate, mobile is several times faster on clean printed documents and "
+        "skips the text line orientation stage.",
+    )
 
     args = arg_parser.parse_args(argv[1:])
+    preload_langs = [lang for lang in args.preload_langs.split(",") if lang]
+    for lang in preload_langs:
+        if lang not in MODEL_LANGUAGES.values():
+            arg_parser.error("unknown language in --preload_langs: %s" % lang)
+    STARTUP_PROFILER.mark("arguments")
 
     win = MainWindow(
         lang=args.lang,
@@ -3914,13 +4992,35 @@ def get_main_app(argv=[]):
         bbox_auto_zoom_center=args.bbox_auto_zoom_center,
         label_font_path=args.label_font_path,
         selected_shape_color=args.selected_shape_color,
+        auto_rec_batch_size=args.auto_rec_batch_size,
+        auto_rec_workers=args.auto_rec_workers,
+        auto_rec_threads_per_worker=args.auto_rec_threads_per_worker,
+        pred_cache_dir=args.pred_cache_dir,
+        pred_cache_size_mb=args.pred_cache_size_mb,
+        look_ahead_num=args.look_ahead_num,
+        auto_rec_log_lines=args.auto_rec_log_lines,
+        det_max_side=args.det_max_side,
+        auto_rec_order=args.auto_rec_order,
+        auto_rec_priority_file=args.auto_rec_priority_file,
+        model_memory_mb=args.model_memory_mb,
+        preload_langs=preload_langs,
+        profile_startup=args.profile_startup,
+        inference_profile=args.inference_profile,
+        speed_profile=args.speed_profile,
+        inference_backend=args.inference_backend,
+        stub_latency_ms=args.stub_latency_ms,
+        annotation_store=args.annotation_store,
     )
     win.show()
+    STARTUP_PROFILER.mark("show")
+    QTimer.singleShot(0, partial(STARTUP_PROFILER.mark, "first paint"))
     return app, win
 
 
 def main():
     """construct main app and run it"""
+    # needed by the auto recognition process pool in frozen (pyinstaller) builds
+    multiprocessing.freeze_support()
     app, _win = get_main_app(sys.argv)
     return app.exec_()
 
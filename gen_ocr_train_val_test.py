@@ -1,9 +1,12 @@
 # coding:utf8
 import os
+import json
 import shutil
 import random
 import argparse
 
+from libs.annotationJournal import AnnotationJournal
+
 
 # Delete the divided train, val, and test folders and create a new empty folder
 def isCreateOrDeleteFolder(path, flag):
@@ -17,6 +20,26 @@ def isCreateOrDeleteFolder(path, flag):
     return flagAbsPath
 
 
+# Read the records of a label file, with the confirmations PPOCRLabel saved to its
+# journal since it last wrote the file in full
+def readLabelRecords(label_file_path):
+    labels = {}
+    with open(label_file_path, "r", encoding="UTF-8") as label_file:
+        for line in label_file:
+            if not line.strip():
+                continue
+            image_relative_path, image_label = line.rstrip("\n").split("\t")
+            labels[image_relative_path] = image_label
+    AnnotationJournal(label_file_path + ".journal").replay({}, labels)
+    return [
+        (
+            path,
+            label if isinstance(label, str) else json.dumps(label, ensure_ascii=False),
+        )
+        for path, label in labels.items()
+    ]
+
+
 def splitTrainVal(
     root,
     abs_train_root_path,
@@ -31,39 +54,35 @@ def splitTrainVal(
     label_file_name = args.detLabelFileName if flag == "det" else args.recLabelFileName
     label_file_path = os.path.join(data_abs_path, label_file_name)
 
-    with open(label_file_path, "r", encoding="UTF-8") as label_file:
-        label_file_content = label_file.readlines()
-        random.shuffle(label_file_content)
-        label_record_len = len(label_file_content)
-
-        for index, label_record_info in enumerate(label_file_content):
-            image_relative_path, image_label = label_record_info.split("\t")
-            image_name = os.path.basename(image_relative_path)
-
-            if flag == "det":
-                image_path = os.path.join(data_abs_path, image_name)
-            elif flag == "rec":
-                image_path = os.path.join(
-                    data_abs_path, args.recImageDirName, image_name
-                )
-
-            train_val_test_ratio = args.trainValTestRatio.split(":")
-            train_ratio = eval(train_val_test_ratio[0]) / 10
-            val_ratio = train_ratio + eval(train_val_test_ratio[1]) / 10
-            cur_ratio = index / label_record_len
-
-            if cur_ratio < train_ratio:
-                image_copy_path = os.path.join(abs_train_root_path, image_name)
-                shutil.copy(image_path, image_copy_path)
-                train_txt.write("{}\t{}".format(image_copy_path, image_label))
-            elif cur_ratio >= train_ratio and cur_ratio < val_ratio:
-                image_copy_path = os.path.join(abs_val_root_path, image_name)
-                shutil.copy(image_path, image_copy_path)
-                val_txt.write("{}\t{}".format(image_copy_path, image_label))
-            else:
-                image_copy_path = os.path.join(abs_test_root_path, image_name)
-                shutil.copy(image_path, image_copy_path)
-                test_txt.write("{}\t{}".format(image_copy_path, image_label))
+    label_file_content = readLabelRecords(label_file_path)
+    random.shuffle(label_file_content)
+    label_record_len = len(label_file_content)
+
+    for index, (image_relative_path, image_label) in enumerate(label_file_content):
+        image_name = os.path.basename(image_relative_path)
+
+        if flag == "det":
+            image_path = os.path.join(data_abs_path, image_name)
+        elif flag == "rec":
+            image_path = os.path.join(data_abs_path, args.recImageDirName, image_name)
+
+        train_val_test_ratio = args.trainValTestRatio.split(":")
+        train_ratio = eval(train_val_test_ratio[0]) / 10
+        val_ratio = train_ratio + eval(train_val_test_ratio[1]) / 10
+        cur_ratio = index / label_record_len
+
+        if cur_ratio < train_ratio:
+            image_copy_path = os.path.join(abs_train_root_path, image_name)
+            shutil.copy(image_path, image_copy_path)
+            train_txt.write("{}\t{}\n".format(image_copy_path, image_label))
+        elif cur_ratio >= train_ratio and cur_ratio < val_ratio:
+            image_copy_path = os.path.join(abs_val_root_path, image_name)
+            shutil.copy(image_path, image_copy_path)
+            val_txt.write("{}\t{}\n".format(image_copy_path, image_label))
+        else:
+            image_copy_path = os.path.join(abs_test_root_path, image_name)
+            shutil.copy(image_path, image_copy_path)
+            test_txt.write("{}\t{}\n".format(image_copy_path, image_label))
 
 
 # Remove the file if it exists
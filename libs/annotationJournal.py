@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger("PPOCRLabel")
+
+# records after which the journal is folded back into Label.txt and fileState.txt
+COMPACT_RECORDS = 500
+
+
+class AnnotationJournal(object):
+    """
+    Append-only journal of the confirmed images not yet written to Label.txt and
+    fileState.txt, so saving one image costs one line instead of rewriting both files.
+    Every record holds the complete state of one image, replaying a record twice gives
+    the same result. Readers apply replay() over the two files.
+
+    compact() folds the journal back into the files on a background thread: the journal
+    is moved aside to path + ".old" and new records go to a fresh one while the files are
+    written, so nothing is lost if the app stops halfway.
+    """
+
+    def __init__(self, path, compact_records=COMPACT_RECORDS):
+        self.path = path
+        self.old_path = path + ".old"
+        self.compact_records = compact_records
+        self.records = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._compaction = None
+
+    def append(self, key, state, label):
+        """
+        Record image key: state is its fileState.txt value or None if it is not checked,
+        label its Label.txt entry or None if it has no line there.
+        """
+        line = json.dumps(
+            {"key": key, "state": state, "label": label}, ensure_ascii=False
+        )
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.records += 1
+
+    def replay(self, states, labels):
+        """Apply the journal to the dicts read from fileState.txt and Label.txt"""
+        count = 0
+        for path in (self.old_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last line may be cut off by a crash
+                        logger.warning("Skip a broken record in %s", path)
+                        continue
+                    key = record["key"]
+                    for target, value in (
+                        (states, record["state"]),
+                        (labels, record["label"]),
+                    ):
+                        if value is None:
+                            target.pop(key, None)
+                        else:
+                            target[key] = value
+                    count += 1
+        self.records = count
+        if count:
+            logger.info(
+                "Replayed %d annotation journal records from %s", count, self.path
+            )
+        return count
+
+    def needsCompaction(self):
+        return self.records >= self.compact_records
+
+    def compact(self, write):
+        """
+        Start folding the journal into the files. write() runs on a background thread and
+        must write the complete files from a copy of the annotations taken by the caller.
+        """
+        self.wait()
+        with self._lock:
+            self._close()
+            if os.path.exists(self.path):
+                if os.path.exists(self.old_path):
+                    # a compaction that failed earlier, keep its records as well
+                    with open(self.path, "r", encoding="utf-8") as src, open(
+                        self.old_path, "a", encoding="utf-8"
+                    ) as dst:
+                        dst.write(src.read())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, self.old_path)
+            self.records = 0
+        self._compaction = threading.Thread(
+            target=self._compact, args=(write,), name="PPOCRLabel-compact", daemon=True
+        )
+        self._compaction.start()
+
+    def _compact(self, write):
+        try:
+            write()
+        except Exception as e:
+            logger.error("Annotation journal compaction failed, it is kept: %s", e)
+            return
+        if os.path.exists(self.old_path):
+            os.remove(self.old_path)
+
+    def wait(self):
+        """Wait for a running compaction"""
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+
+    def reset(self):
+        """Drop the journal after the files were written in full by the caller"""
+        self.wait()
+        with self._lock:
+            self._close()
+            for path in (self.path, self.old_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.records = 0
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        self.wait()
+        with self._lock:
+            self._close()
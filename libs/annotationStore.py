@@ -0,0 +1,382 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from libs.labelCodec import LabelDict, parseLabel
+from libs.sessionSnapshot import fileSignature
+
+logger = logging.getLogger("PPOCRLabel")
+
+# the label files of a directory the store holds, by name
+FILE_NAMES = {"label": "Label.txt", "cache": "Cache.cach", "state": "fileState.txt"}
+
+
+class AnnotationStore(object):
+    """
+    Label.txt, Cache.cach and fileState.txt of one directory in a single SQLite file.
+    Every line is kept as its key and the exact text after the tab, in file order. Blank
+    lines and lines without a tab are kept as they are, and so is a missing newline at the
+    end, so importFile followed by exportFile gives back the same bytes. The exception is
+    a repeated key: like a dict it keeps its first position and last value.
+    Boxes are also stored one per row to query by transcription and key_cls, and check
+    states are indexed.
+    The database runs in WAL mode: other processes can read it while PPOCRLabel writes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "file TEXT, key TEXT, seq INTEGER, raw TEXT, PRIMARY KEY (file, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_seq ON entries(file, seq)")
+        # the lines of a text file that are not records, at their place among the entries
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lines ("
+            "file TEXT, seq INTEGER, text TEXT, PRIMARY KEY (file, seq))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_state ON entries(raw) WHERE file = 'state'"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS boxes ("
+            "file TEXT, key TEXT, idx INTEGER, transcription TEXT, key_cls TEXT, "
+            "difficult INTEGER, PRIMARY KEY (file, key, idx))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transcription ON boxes(transcription)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_key_cls ON boxes(key_cls)")
+        # signature of each text file when it was last imported or exported, and whether
+        # the store changed since
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "file TEXT PRIMARY KEY, signature TEXT, dirty INTEGER)"
+        )
+        # whether the last line of the text file ends with a newline, added to stores
+        # created before it was tracked
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(files)")]
+        if "final_newline" not in columns:
+            self._conn.execute(
+                "ALTER TABLE files ADD COLUMN final_newline INTEGER DEFAULT 1"
+            )
+        self._conn.commit()
+
+    @staticmethod
+    def encode(name, value):
+        if name == "state":
+            return str(value)
+        return json.dumps(value, ensure_ascii=False)
+
+    @staticmethod
+    def decode(name, raw):
+        if name == "state":
+            return int(raw)
+        return parseLabel(raw)
+
+    def _boxRows(self, name, key, raw):
+        if name == "state":
+            return []
+        try:
+            label = parseLabel(raw)
+        except (ValueError, SyntaxError):
+            logger.warning("Can not index the boxes of %s in %s", key, name)
+            return []
+        return [
+            (
+                name,
+                key,
+                i,
+                box.get("transcription"),
+                box.get("key_cls"),
+                int(bool(box.get("difficult"))),
+            )
+            for i, box in enumerate(label)
+        ]
+
+    def _write(self, name, key, raw, seq=None):
+        # seq None appends a new key at the end, an existing key keeps its position
+        if seq is None:
+            updated = self._conn.execute(
+                "UPDATE entries SET raw = ? WHERE file = ? AND key = ?",
+                (raw, name, key),
+            ).rowcount
+            if not updated:
+                # each MAX is answered from the (file, seq) index of its table
+                self._conn.execute(
+                    "INSERT INTO entries VALUES (?, ?, MAX("
+                    "COALESCE((SELECT MAX(seq) FROM entries WHERE file = ?), 0), "
+                    "COALESCE((SELECT MAX(seq) FROM lines WHERE file = ?), 0)) + 1, ?)",
+                    (name, key, name, name, raw),
+                )
+        else:
+            self._conn.execute(
+                "INSERT INTO entries VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (file, key) DO UPDATE SET raw = excluded.raw",
+                (name, key, seq, raw),
+            )
+        self._conn.execute("DELETE FROM boxes WHERE file = ? AND key = ?", (name, key))
+        self._conn.executemany(
+            "INSERT INTO boxes VALUES (?, ?, ?, ?, ?, ?)", self._boxRows(name, key, raw)
+        )
+
+    def _delete(self, name, key):
+        self._conn.execute(
+            "DELETE FROM entries WHERE file = ? AND key = ?", (name, key)
+        )
+        self._conn.execute("DELETE FROM boxes WHERE file = ? AND key = ?", (name, key))
+
+    def _clear(self, name):
+        self._conn.execute("DELETE FROM entries WHERE file = ?", (name,))
+        self._conn.execute("DELETE FROM boxes WHERE file = ?", (name,))
+        self._conn.execute("DELETE FROM lines WHERE file = ?", (name,))
+
+    def _setFile(self, name, signature, dirty, final_newline=None):
+        # final_newline None keeps the stored one
+        self._conn.execute(
+            "INSERT INTO files (file, signature, dirty) VALUES (?, ?, ?) "
+            "ON CONFLICT (file) DO UPDATE "
+            "SET signature = excluded.signature, dirty = excluded.dirty",
+            (name, json.dumps(signature), int(dirty)),
+        )
+        if final_newline is not None:
+            self._conn.execute(
+                "UPDATE files SET final_newline = ? WHERE file = ?",
+                (int(final_newline), name),
+            )
+
+    def _markDirty(self, name):
+        self._conn.execute(
+            "INSERT INTO files (file, signature, dirty) VALUES (?, 'null', 1) "
+            "ON CONFLICT (file) DO UPDATE SET dirty = 1",
+            (name,),
+        )
+
+    def putMany(self, name, items):
+        """Upsert (key, value) pairs in one transaction, a value of None removes the key"""
+        with self._lock:
+            for key, value in items:
+                if value is None:
+                    self._delete(name, key)
+                else:
+                    self._write(name, key, self.encode(name, value))
+            self._markDirty(name)
+            self._conn.commit()
+
+    def put(self, name, key, value):
+        self.putMany(name, [(key, value)])
+
+    def replace(self, name, mapping):
+        """
+        Make the content of name exactly {key: value} of mapping, in its order, followed by
+        the unparsed lines of a LabelDict that are not about a key of mapping. Like
+        writeLabelFile, the text file has no blank lines and ends with a newline then.
+        """
+        with self._lock:
+            self._clear(name)
+            seq = 0
+            for seq, (key, value) in enumerate(mapping.items(), 1):
+                self._write(name, key, self.encode(name, value), seq)
+            for line in getattr(mapping, "unparsed", ()):
+                key, sep, raw = line.partition("\t")
+                if not sep:
+                    seq += 1
+                    self._conn.execute(
+                        "INSERT INTO lines VALUES (?, ?, ?)", (name, seq, line)
+                    )
+                elif key not in mapping:
+                    seq += 1
+                    self._write(name, key, raw, seq)
+            self._markDirty(name)
+            self._conn.execute(
+                "UPDATE files SET final_newline = 1 WHERE file = ?", (name,)
+            )
+            self._conn.commit()
+
+    def load(self, name):
+        """
+        LabelDict {key: value} of name in file order, the lines that can not be parsed are
+        in its unparsed list so that replace keeps them
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, raw FROM entries WHERE file = ? ORDER BY seq", (name,)
+            ).fetchall()
+            lines = self._conn.execute(
+                "SELECT text FROM lines WHERE file = ? ORDER BY seq", (name,)
+            ).fetchall()
+        content = LabelDict()
+        for key, raw in rows:
+            try:
+                content[key] = self.decode(name, raw)
+            except (ValueError, SyntaxError) as e:
+                logger.warning("%s of %s can not be parsed, kept: %s", key, name, e)
+                content.unparsed.append(key + "\t" + raw)
+        # blank lines are not carried over to replace, like writeLabelFile drops them
+        content.unparsed.extend(text for text, in lines if text.strip())
+        return content
+
+    def importFile(self, name, path):
+        """Replace the content of name with the text file path, returns the line count"""
+        count = 0
+        final_newline = True
+        with self._lock:
+            self._clear(name)
+            # lines end at \n only and keep a \r in their text
+            with open(path, "r", encoding="utf-8", newline="\n") as f:
+                for lineno, line in enumerate(f, 1):
+                    final_newline = line.endswith("\n")
+                    text = line[:-1] if final_newline else line
+                    key, sep, raw = text.partition("\t")
+                    if sep:
+                        self._write(name, key, raw, lineno)
+                    else:
+                        if text.strip():
+                            logger.warning("%s:%d has no tab", path, lineno)
+                        self._conn.execute(
+                            "INSERT INTO lines VALUES (?, ?, ?)", (name, lineno, text)
+                        )
+                    count += 1
+            self._setFile(name, fileSignature(path), False, final_newline)
+            self._conn.commit()
+        return count
+
+    def exportFile(self, name, path):
+        """Write name as a text file to path, returns the line count"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, raw, seq FROM entries WHERE file = ? "
+                "UNION ALL SELECT NULL, text, seq FROM lines WHERE file = ? "
+                "ORDER BY seq",
+                (name, name),
+            ).fetchall()
+            row = self._conn.execute(
+                "SELECT final_newline FROM files WHERE file = ?", (name,)
+            ).fetchone()
+            final_newline = row is None or bool(row[0])
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                for i, (key, raw, _) in enumerate(rows, 1):
+                    f.write(raw if key is None else key + "\t" + raw)
+                    if i < len(rows) or final_newline:
+                        f.write("\n")
+            os.replace(tmp_path, path)
+            self._setFile(name, fileSignature(path), False)
+            self._conn.commit()
+        return len(rows)
+
+    def markExported(self, name, path):
+        """Call after path was written with the current content of name by someone else"""
+        with self._lock:
+            self._setFile(name, fileSignature(path), False)
+            self._conn.commit()
+
+    def _fileRow(self, name):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT signature, dirty FROM files WHERE file = ?", (name,)
+            ).fetchone()
+        if row is None:
+            return None, False
+        signature = json.loads(row[0])
+        return (tuple(signature) if signature else None), bool(row[1])
+
+    def needsImport(self, name, path):
+        """True if path was changed by someone else since it was imported or exported"""
+        if not os.path.exists(path):
+            return False
+        signature, dirty = self._fileRow(name)
+        if signature == fileSignature(path):
+            return False
+        if dirty:
+            logger.warning("%s changed outside PPOCRLabel, it replaces the store", path)
+        return True
+
+    def isDirty(self, name):
+        """True if name changed since its text file was last written or read"""
+        return self._fileRow(name)[1]
+
+    def findKeys(self, name="label", status=None, key_cls=None, transcription=None):
+        """
+        Keys of name in file order that have a box with key_cls and transcription and the
+        check state status. A transcription containing % or _ is matched with LIKE.
+        """
+        sql = "SELECT DISTINCT e.key, e.seq FROM entries e"
+        where, args = ["e.file = ?"], [name]
+        if key_cls is not None or transcription is not None:
+            sql += " JOIN boxes b ON b.file = e.file AND b.key = e.key"
+            if key_cls is not None:
+                where.append("b.key_cls = ?")
+                args.append(key_cls)
+            if transcription is not None:
+                op = "LIKE" if "%" in transcription or "_" in transcription else "="
+                where.append("b.transcription %s ?" % op)
+                args.append(transcription)
+        if status is not None:
+            sql += " JOIN entries s ON s.file = 'state' AND s.key = e.key"
+            where.append("s.raw = ?")
+            args.append(str(status))
+        sql += " WHERE " + " AND ".join(where) + " ORDER BY e.seq"
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, args).fetchall()]
+
+    def statusCounts(self):
+        """{check state: number of images} from fileState.txt"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT raw, COUNT(*) FROM entries WHERE file = 'state' GROUP BY raw"
+            ).fetchall()
+        return {int(raw): count for raw, count in rows}
+
+    def count(self, name):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM entries WHERE file = ?", (name,)
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import, export or query the annotation store of a PPOCRLabel directory"
+    )
+    parser.add_argument("command", choices=("import", "export", "query"))
+    parser.add_argument("image_dir", type=str)
+    parser.add_argument("--file", type=str, default="label", choices=tuple(FILE_NAMES))
+    parser.add_argument("--status", type=int, default=None)
+    parser.add_argument("--key_cls", type=str, default=None)
+    parser.add_argument(
+        "--transcription", type=str, default=None, help="exact text or a LIKE pattern"
+    )
+    args = parser.parse_args()
+
+    store = AnnotationStore(os.path.join(args.image_dir, "annotations.db"))
+    if args.command == "query":
+        for key in store.findKeys(
+            args.file, args.status, args.key_cls, args.transcription
+        ):
+            print(key)
+    else:
+        for name, filename in FILE_NAMES.items():
+            path = os.path.join(args.image_dir, filename)
+            if args.command == "import":
+                if not os.path.exists(path):
+                    continue
+                count = store.importFile(name, path)
+            else:
+                count = store.exportFile(name, path)
+            print("%s %s: %d lines" % (args.command, path, count))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,105 +1,242 @@
 import datetime
 import json
 import logging
+import threading
 import time
+from collections import deque
+from functools import partial
 
-import cv2
-import numpy as np
-from PyQt5.QtCore import QThread, pyqtSignal, Qt
+from PyQt5.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QThread,
+    QTimer,
+    pyqtSignal,
+    Qt,
+)
 from PyQt5.QtWidgets import (
     QDialog,
     QDialogButtonBox as BB,
     QProgressBar,
     QVBoxLayout,
-    QListWidget,
+    QListView,
 )
 
+from libs.autoSchedule import orderImages
+from libs.imagePrefetcher import ImagePrefetcher, readImage
+from libs.ocrPool import recognizeLoaded
 from libs.utils import newIcon
 
 logger = logging.getLogger("PPOCRLabel")
 
+# how often the dialog picks up progress and log lines from the worker
+REFRESH_INTERVAL_MS = 200
+# window of the moving average used for the time left
+ETA_WINDOW_SECONDS = 30
+# longest time the dialog blocks on cancel, a batch still in the model ends in the background
+CANCEL_WAIT_MS = 500
+
+
+class LogChannel(object):
+    """
+    Thread-safe channel from the worker to the dialog. Every line goes to the log file,
+    only the newest max_lines wait for the dialog, which drains them at a fixed rate.
+    """
+
+    def __init__(self, log_path=None, max_lines=1000):
+        self._lock = threading.Lock()
+        self._lines = deque(maxlen=max(1, max_lines))
+        self._done = 0
+        self._file = None
+        if log_path is not None:
+            try:
+                self._file = open(log_path, "a", encoding="utf-8")
+                self._file.write(
+                    "==== Auto recognition started at %s ====\n"
+                    % datetime.datetime.now().isoformat(timespec="seconds")
+                )
+            except OSError as e:
+                logger.warning("Can not write auto recognition log %s: %s", log_path, e)
+
+    def write(self, text):
+        with self._lock:
+            if self._file is not None:
+                self._file.write(text if text.endswith("\n") else text + "\n")
+            self._lines.append(text)
+
+    def progress(self, done):
+        with self._lock:
+            self._done = done
+
+    def drain(self):
+        """Return the number of finished images and the lines written since the last call"""
+        with self._lock:
+            lines = list(self._lines)
+            self._lines.clear()
+            return self._done, lines
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class RingLogModel(QAbstractListModel):
+    """List model that keeps only the newest max_lines entries"""
+
+    def __init__(self, max_lines=1000, parent=None):
+        super(RingLogModel, self).__init__(parent)
+        self._lines = deque(maxlen=max(1, max_lines))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._lines)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self._lines[index.row()]
+        return None
+
+    def extend(self, lines):
+        if not lines:
+            return
+        lines = lines[-self._lines.maxlen :]
+        overflow = len(self._lines) + len(lines) - self._lines.maxlen
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._lines.popleft()
+            self.endRemoveRows()
+        start = len(self._lines)
+        self.beginInsertRows(QModelIndex(), start, start + len(lines) - 1)
+        self._lines.extend(lines)
+        self.endInsertRows()
+
 
 class Worker(QThread):
-    progressBarValue = pyqtSignal(int)
-    listValue = pyqtSignal(str)
+    # (img_path, result_dic), delivered to the GUI thread which owns the label store
+    resultValue = pyqtSignal(str, object)
     end_signal = pyqtSignal(int, str)
     handle = 0
 
-    def __init__(self, ocr, img_list, main_thread, model):
+    def __init__(
+        self,
+        ocr,
+        img_list,
+        batch_size=1,
+        decode_workers=2,
+        pool=None,
+        cache=None,
+        model_id=None,
+        log=None,
+        det_max_side=0,
+        order="list",
+        priority_file=None,
+    ):
         super(Worker, self).__init__()
         self.result_dic = None
         self.ocr = ocr
         self.img_list = img_list
-        self.mainThread = main_thread
-        self.model = model
+        # number of images fed to the pipeline in one predict call
+        self.batch_size = max(1, int(batch_size))
+        # threads reading and decoding upcoming images while the model runs
+        self.decode_workers = max(1, int(decode_workers))
+        # optional OCRProcessPool, recognition runs in its processes when set
+        self.pool = pool
+        # optional PredictionCache and the identity of the pipeline for its keys
+        self.cache = cache
+        self.model_id = model_id
+        # longest side of the detection input, 0 keeps the original size
+        self.det_max_side = det_max_side
+        # scheduling policy of autoSchedule.orderImages
+        self.order = order
+        self.priority_file = priority_file
+        self._stop = threading.Event()
+        # LogChannel receiving progress and the per-image transcriptions
+        self.log = log if log is not None else LogChannel()
         self.setStackSize(1024 * 1024)
 
+    def iterResults(self):
+        """Yield lists of (img_path, result_dic) in the order they become available"""
+        if self.pool is not None:
+            yield from self.pool.imap(self.img_list, self.batch_size, self._stop)
+            return
+
+        prefetcher = ImagePrefetcher(
+            self.img_list,
+            num_workers=self.decode_workers,
+            max_pending=max(4, 2 * self.batch_size),
+            loader=partial(readImage, cache=self.cache, model_id=self.model_id),
+        )
+        try:
+            for batch in prefetcher.batches(self.batch_size):
+                results = recognizeLoaded(
+                    self.ocr, batch, self.cache, self.det_max_side
+                )
+                yield [(img_path, res) for (img_path, _), res in zip(batch, results)]
+        finally:
+            prefetcher.close()
+
+    def cancel(self):
+        """Stop after the images in flight, results that are already done are still delivered"""
+        self.handle = -1
+        self._stop.set()
+
     def run(self):
+        # always emitted, so the dialog and the main window learn that the job ended
+        status, message = 0, "readAll"
         try:
             findex = 0
-            for img_path in self.img_list:
-                if self.handle == 0:
-                    self.listValue.emit(img_path)
-                    if self.model == "paddle":
-                        h, w, _ = cv2.imdecode(
-                            np.fromfile(img_path, dtype=np.uint8), 1
-                        ).shape
-                        if h > 32 and w > 32:
-                            result = self.ocr.predict(img_path)[0]
-                            self.result_dic = []
-                            for poly, text, score in zip(
-                                result["rec_polys"],
-                                result["rec_texts"],
-                                result["rec_scores"],
-                            ):
-                                # Convert numpy array to list for JSON serialization
-                                poly_list = (
-                                    poly.tolist() if hasattr(poly, "tolist") else poly
-                                )
-                                self.result_dic.append([poly_list, (text, score)])
-                        else:
-                            logger.warning(
-                                "The size of %s is too small to be recognised", img_path
-                            )
-                            self.result_dic = None
-
-                    # 结果保存
-                    if self.result_dic is None or len(self.result_dic) == 0:
-                        logger.warning("Can not recognise file %s", img_path)
-                        pass
-                    else:
-                        strs = ""
-                        for res in self.result_dic:
-                            chars = res[1][0]
-                            cond = res[1][1]
-                            posi = res[0]
-                            strs += (
-                                "Transcription: "
-                                + chars
-                                + " Probability: "
-                                + str(cond)
-                                + " Location: "
-                                + json.dumps(posi)
-                                + "\n"
-                            )
-                        # Sending large amounts of data repeatedly through pyqtSignal may affect the program efficiency
-                        self.listValue.emit(strs)
-                        self.mainThread.result_dic = self.result_dic
-                        self.mainThread.filePath = img_path
-                        # 保存
-                        self.mainThread.saveFile(mode="Auto")
-                    findex += 1
-                    self.progressBarValue.emit(findex)
-                else:
-                    break
-            self.end_signal.emit(0, "readAll")
-            self.exec()
+            self.img_list = orderImages(self.img_list, self.order, self.priority_file)
+            results = self.iterResults()
+            try:
+                for group in results:
+                    for img_path, result_dic in group:
+                        self.log.write(img_path)
+                        self.result_dic = result_dic
+                        self.saveResult(img_path)
+                        findex += 1
+                        self.log.progress(findex)
+                    if self.handle != 0:
+                        break
+            finally:
+                results.close()
         except Exception as e:
-            logger.error("Error in worker thread: %s", e)
-            raise
+            logger.exception("Error in worker thread: %s", e)
+            status, message = -1, str(e)
+        finally:
+            self.end_signal.emit(status, message)
+
+    def saveResult(self, img_path):
+        # 结果保存
+        if self.result_dic is None or len(self.result_dic) == 0:
+            logger.warning("Can not recognise file %s", img_path)
+            self.resultValue.emit(img_path, None)
+            return
+        strs = ""
+        for res in self.result_dic:
+            chars = res[1][0]
+            cond = res[1][1]
+            posi = res[0]
+            strs += (
+                "Transcription: "
+                + chars
+                + " Probability: "
+                + str(cond)
+                + " Location: "
+                + json.dumps(posi)
+                + "\n"
+            )
+        # the dialog picks this up at a fixed rate instead of one signal per image
+        self.log.write(strs)
+        # 保存
+        self.resultValue.emit(img_path, self.result_dic)
 
 
 class AutoDialog(QDialog):
+    # emitted once the worker has stopped, after all of its results were delivered
+    jobFinished = pyqtSignal()
+
     def __init__(
         self,
         text="Enter object label",
@@ -107,6 +244,15 @@ class AutoDialog(QDialog):
         ocr=None,
         image_list=None,
         len_bar=0,
+        batch_size=1,
+        pool=None,
+        cache=None,
+        model_id=None,
+        log_path=None,
+        max_log_lines=1000,
+        det_max_side=0,
+        order="list",
+        priority_file=None,
     ):
         super(AutoDialog, self).__init__(parent)
         self.setFixedWidth(1000)
@@ -120,9 +266,11 @@ class AutoDialog(QDialog):
 
         layout = QVBoxLayout()
         layout.addWidget(self.pb)
-        self.model = "paddle"
-        self.listWidget = QListWidget(self)
-        layout.addWidget(self.listWidget)
+        self.logModel = RingLogModel(max_log_lines, self)
+        self.listView = QListView(self)
+        self.listView.setModel(self.logModel)
+        self.listView.setUniformItemSizes(True)
+        layout.addWidget(self.listView)
 
         self.buttonBox = bb = BB(BB.Ok | BB.Cancel, Qt.Horizontal, self)
         bb.button(BB.Ok).setIcon(newIcon("done"))
@@ -134,46 +282,76 @@ class AutoDialog(QDialog):
 
         self.setLayout(layout)
         # self.setWindowTitle("自动标注中")
-        self.setWindowModality(Qt.ApplicationModal)
+        # runs in the background, the annotator keeps working while it is open
+        self.setWindowModality(Qt.NonModal)
 
         # self.setWindowFlags(Qt.WindowCloseButtonHint)
 
-        self.thread_1 = Worker(self.ocr, self.img_list, self.parent, "paddle")
-        self.thread_1.progressBarValue.connect(self.handleProgressBarSingal)
-        self.thread_1.listValue.connect(self.handleListWidgetSingal)
+        self.thread_1 = Worker(
+            self.ocr,
+            self.img_list,
+            batch_size=batch_size,
+            pool=pool,
+            cache=cache,
+            model_id=model_id,
+            log=LogChannel(log_path, max_log_lines),
+            det_max_side=det_max_side,
+            order=order,
+            priority_file=priority_file,
+        )
         self.thread_1.end_signal.connect(self.handleEndsignalSignal)
         self.time_start = time.time()  # save start time
+        # (time, finished images) samples for the moving average throughput
+        self.samples = deque([(self.time_start, 0)])
+        self.refreshTimer = QTimer(self)
+        self.refreshTimer.setInterval(REFRESH_INTERVAL_MS)
+        self.refreshTimer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        done, lines = self.thread_1.log.drain()
+        if lines:
+            self.logModel.extend(lines)
+            self.listView.scrollToBottom()
+        if done == self.pb.value():
+            return
+        self.pb.setValue(done)
 
-    def handleProgressBarSingal(self, i):
-        self.pb.setValue(i)
-
-        # calculate time left of auto labeling
-        # Use average time to prevent time fluctuations
-        avg_time = (time.time() - self.time_start) / i
-        time_left = str(
-            datetime.timedelta(seconds=avg_time * (self.len_bar - i))
-        ).split(".")[
-            0
-        ]  # Remove microseconds
-        # show
-        self.setWindowTitle("PPOCRLabel  --  " + f"Time Left: {time_left}")
-
-    def handleListWidgetSingal(self, i):
-        self.listWidget.addItem(i)
-        titem = self.listWidget.item(self.listWidget.count() - 1)
-        self.listWidget.scrollToItem(titem)
-
-    def handleEndsignalSignal(self, i, str):
-        if i == 0 and str == "readAll":
-            self.buttonBox.button(BB.Ok).setEnabled(True)
-            self.buttonBox.button(BB.Cancel).setEnabled(False)
+        # calculate time left of auto labeling from the throughput of the last seconds
+        now = time.time()
+        self.samples.append((now, done))
+        while len(self.samples) > 2 and now - self.samples[0][0] > ETA_WINDOW_SECONDS:
+            self.samples.popleft()
+        t0, done0 = self.samples[0]
+        if done > done0 and now > t0:
+            rate = (done - done0) / (now - t0)
+            time_left = str(
+                datetime.timedelta(seconds=(self.len_bar - done) / rate)
+            ).split(".")[
+                0
+            ]  # Remove microseconds
+            self.setWindowTitle("PPOCRLabel  --  " + f"Time Left: {time_left}")
+
+    def handleEndsignalSignal(self, status, message):
+        # status is 0 when the job ran to the end or was cancelled, -1 when it failed
+        self.refreshTimer.stop()
+        self.refresh()
+        if status != 0:
+            self.logModel.extend(["Auto recognition failed: " + message])
+            self.listView.scrollToBottom()
+            self.setWindowTitle("PPOCRLabel  --  Auto recognition failed")
+        self.thread_1.log.close()
+        self.buttonBox.button(BB.Ok).setEnabled(True)
+        self.buttonBox.button(BB.Cancel).setEnabled(False)
+        self.thread_1.quit()
+        self.jobFinished.emit()
 
     def reject(self):
         logger.debug("Auto recognition dialog rejected")
-        self.thread_1.handle = -1
-        self.thread_1.quit()
-        while not self.thread_1.isFinished():
-            pass
+        self.thread_1.cancel()
+        # wait() sleeps instead of spinning, and only for a bounded time
+        if not self.thread_1.wait(CANCEL_WAIT_MS):
+            self.setWindowTitle("PPOCRLabel  --  Stopping...")
+            logger.info("Auto recognition stops after the images in flight")
         self.accept()
 
     def validate(self):
@@ -187,8 +365,10 @@ class AutoDialog(QDialog):
             logger.debug("Auto dialog text: %s", self.edit.text())
 
     def popUp(self):
+        self.refreshTimer.start()
         self.thread_1.start()
-        return 1 if self.exec_() else None
+        self.show()
+        return 1
 
     def closeEvent(self, event, **kwargs):
         self.reject()
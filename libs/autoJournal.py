@@ -0,0 +1,71 @@
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger("PPOCRLabel")
+
+
+class AutoRecJournal(object):
+    """
+    Append-only journal of an auto recognition run. The planned images are written first,
+    then one record per finished image, each flushed to disk right away so a crash loses at
+    most the image in flight. The journal is compacted into Cache.cach once the run ends.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def begin(self, plan):
+        """Start a run over the image keys in plan"""
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._write({"plan": list(plan)})
+
+    def append(self, key, label):
+        """Record a finished image, label is None when nothing was recognised"""
+        self._write({"key": key, "label": label})
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def replay(self):
+        """
+        Read back an interrupted run.
+        Returns (plan, results) where results maps each finished image key to its label
+        list, or to None if the image was processed without a result.
+        """
+        plan = {}
+        results = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # the last line may be cut off by the crash
+                    logger.warning("Skip a broken record in %s", self.path)
+                    continue
+                if "plan" in record:
+                    plan.update(dict.fromkeys(record["plan"]))
+                else:
+                    results[record["key"]] = record["label"]
+        return list(plan), results
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
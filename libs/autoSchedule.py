@@ -0,0 +1,61 @@
+import logging
+import os
+
+from PyQt5.QtGui import QImageReader
+
+logger = logging.getLogger("PPOCRLabel")
+
+# orders auto recognition can process the images in
+ORDER_POLICIES = ("list", "smallest", "priority")
+
+
+def imagePixels(img_path):
+    """Pixel count read from the image header, the image itself is not decoded"""
+    size = QImageReader(img_path).size()
+    if not size.isValid():
+        return float("inf")
+    return size.width() * size.height()
+
+
+def readPriorityFile(priority_file):
+    """Map every image listed in priority_file to its line number, one path or file name per line"""
+    ranks = {}
+    with open(priority_file, "r", encoding="utf-8") as f:
+        for line in f:
+            name = line.strip()
+            if not name or name.startswith("#"):
+                continue
+            ranks.setdefault(os.path.normcase(os.path.normpath(name)), len(ranks))
+    return ranks
+
+
+def orderImages(img_list, policy="list", priority_file=None):
+    """
+    Order the images of an auto recognition job.
+    list keeps the file list order, smallest runs the cheapest images first so most of the
+    folder is labelled early, priority runs the images of priority_file first in the order
+    they are listed there and the rest in list order.
+    """
+    img_list = list(img_list)
+    if policy == "smallest":
+        # sorted() is stable, images of equal size keep the list order
+        return sorted(img_list, key=imagePixels)
+    if policy == "priority":
+        if not priority_file:
+            logger.warning(
+                "No priority file given, images are recognised in list order"
+            )
+            return img_list
+        try:
+            ranks = readPriorityFile(priority_file)
+        except OSError as e:
+            logger.error("Can not read priority file %s: %s", priority_file, e)
+            return img_list
+        unlisted = len(ranks)
+
+        def rank(img_path):
+            path = os.path.normcase(os.path.normpath(img_path))
+            return ranks.get(path, ranks.get(os.path.basename(path), unlisted))
+
+        return sorted(img_list, key=rank)
+    return img_list
@@ -0,0 +1,107 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("PPOCRLabel")
+
+
+def decodeImage(img_path):
+    """Read and decode an image file into a BGR ndarray, None if it is unreadable."""
+    return cv2.imdecode(np.fromfile(img_path, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def readImage(img_path, cache=None, model_id=None):
+    """
+    Read an image file once and look it up in a PredictionCache.
+    Returns (img, cache_key, cached_result); img is only decoded on a cache miss.
+    """
+    data = np.fromfile(img_path, dtype=np.uint8)
+    key = None
+    if cache is not None:
+        key = cache.makeKey(data, model_id)
+        cached = cache.get(key)
+        if cached is not None:
+            return None, key, cached
+    return cv2.imdecode(data, cv2.IMREAD_COLOR), key, None
+
+
+class ImagePrefetcher(object):
+    """
+    Decode upcoming images on a small thread pool so disk I/O and decoding overlap
+    with model inference. At most max_pending images are read ahead of the consumer.
+    loader turns a path into whatever the consumer needs, a decoded image by default.
+    """
+
+    def __init__(self, img_list, num_workers=2, max_pending=8, loader=decodeImage):
+        self.img_list = list(img_list)
+        self.loader = loader
+        self._queue = queue.Queue(maxsize=max(1, max_pending))
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, num_workers), thread_name_prefix="PPOCRLabel-decode"
+        )
+        self._feeder = threading.Thread(target=self._feed, daemon=True)
+        self._feeder.start()
+
+    def _feed(self):
+        for img_path in self.img_list:
+            if self._stop.is_set():
+                break
+            try:
+                future = self._executor.submit(self.loader, img_path)
+            except RuntimeError:
+                # the executor was shut down by close()
+                break
+            if not self._put((img_path, future)):
+                future.cancel()
+                break
+        self._put(None)
+
+    def _put(self, item):
+        # block while the queue is full, but give up as soon as close() is called
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            img_path, future = item
+            try:
+                img = future.result()
+            except Exception as e:
+                logger.error("Can not decode %s: %s", img_path, e)
+                img = None
+            yield img_path, img
+
+    def batches(self, batch_size):
+        """Yield lists of (img_path, img) with at most batch_size entries each"""
+        batch = []
+        for item in self:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def close(self):
+        self._stop.set()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# dependencies PPOCRLabel imports only when the feature that needs them is used
+DEFERRED_IMPORTS = (
+    "paddle",
+    "paddleocr",
+    "openpyxl",
+    "tablepyxl.tablepyxl",
+    "pandas.io.sql",
+)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measureImports(statement, python=sys.executable):
+    """
+    Run statement in a fresh interpreter with -X importtime.
+    Returns {module: (self_us, cumulative_us, depth)} for every module it imported.
+    """
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", statement],
+        cwd=ROOT_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    modules = {}
+    errors = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(fields[0]), int(fields[1]), depth)
+    if proc.returncode != 0:
+        raise RuntimeError("\n".join(errors[-20:]))
+    return modules
+
+
+def missingImports(names, python=sys.executable):
+    """The modules of names that can not be imported in this environment"""
+    statement = (
+        "import importlib\n"
+        "for name in %r:\n"
+        "    try:\n"
+        "        importlib.import_module(name)\n"
+        "    except Exception:\n"
+        "        print(name)\n" % (list(names),)
+    )
+    proc = subprocess.run(
+        [python, "-c", statement],
+        cwd=ROOT_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    return [line for line in proc.stdout.splitlines() if line]
+
+
+def totalTime(modules):
+    return sum(cum for _, cum, depth in modules.values() if depth == 0)
+
+
+def buildReport(top=15):
+    """Import cost of PPOCRLabel at startup now, and with the deferred imports loaded eagerly"""
+    # a dependency that is not installed can not be measured, its saving is left out
+    missing = missingImports(DEFERRED_IMPORTS)
+    available = [m for m in DEFERRED_IMPORTS if m not in missing]
+    after = measureImports("import PPOCRLabel")
+    before = measureImports(
+        "import PPOCRLabel\n" + "\n".join("import " + m for m in available)
+    )
+    deferred = {}
+    for name in available:
+        # the cost shows up on the outermost package that was not imported yet
+        package = name.split(".")[0]
+        entry = before.get(name) or before.get(package)
+        if entry is not None and entry[2] == 0:
+            deferred[name] = entry[1]
+    slowest = sorted(after.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return {
+        "before_ms": totalTime(before) / 1000.0,
+        "after_ms": totalTime(after) / 1000.0,
+        "deferred_ms": {k: v / 1000.0 for k, v in deferred.items()},
+        "slowest_ms": [[name, v[0] / 1000.0] for name, v in slowest],
+        "not_measured": missing,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Startup import report of PPOCRLabel built from python -X importtime"
+    )
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = buildReport(args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print("Import time with eager imports : %8.1f ms" % report["before_ms"])
+    print("Import time with deferred ones : %8.1f ms" % report["after_ms"])
+    print(
+        "Saved at startup               : %8.1f ms"
+        % (report["before_ms"] - report["after_ms"])
+    )
+    print("\nDeferred dependencies (cumulative):")
+    for name, ms in report["deferred_ms"].items():
+        print("  %-24s %8.1f ms" % (name, ms))
+    for name in report["not_measured"]:
+        print("  %-24s not importable here, not measured" % name)
+    print("\nSlowest modules still imported at startup (self):")
+    for name, ms in report["slowest_ms"]:
+        print("  %-40s %8.1f ms" % (name, ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import abc
+import hashlib
+import time
+
+import numpy as np
+
+from libs.ocrPool import detLimitParams
+
+# names accepted by --inference_backend
+BACKEND_NAMES = ("paddle", "stub")
+
+
+def toList(value):
+    return value.tolist() if hasattr(value, "tolist") else value
+
+
+class InferenceBackend(abc.ABC):
+    """
+    What the labelling features need from an OCR engine. Images are BGR ndarrays and every
+    result is plain lists, strings and floats, so it can be cached and written to JSON.
+
+    detect(img)                 -> [polygon], a polygon is a list of [x, y] points
+    recognize(img)              -> {"rec_text": str, "rec_score": float}
+    ocr(imgs, det_max_side=0)   -> one [[polygon, (text, score)], ...] per image
+    table(img, det_max_side=0)  -> {"table_res_list": [{"table_ocr_pred": {"rec_boxes":
+                                   [[x1, y1, x2, y2]], "rec_texts": [str]},
+                                   "pred_html": str}]} or None
+    """
+
+    name = None
+
+    @abc.abstractmethod
+    def detect(self, img):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def recognize(self, img):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def ocr(self, imgs, det_max_side=0):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def table(self, img, det_max_side=0):
+        raise NotImplementedError
+
+
+class PaddleBackend(InferenceBackend):
+    """
+    PaddleOCR adapter. getModel(kind) returns the built model of kind "ocr" (PaddleOCR),
+    "det" (TextDetection), "rec" (TextRecognition) or "table" (PPStructureV3), so the
+    models can be swapped, e.g. on a language change, without a new backend.
+    """
+
+    name = "paddle"
+
+    def __init__(self, getModel):
+        self.getModel = getModel
+
+    def detect(self, img):
+        return toList(self.getModel("det").predict(img)[0]["dt_polys"])
+
+    def recognize(self, img):
+        result = self.getModel("rec").predict(img)[0]
+        return {"rec_text": result["rec_text"], "rec_score": float(result["rec_score"])}
+
+    def ocr(self, imgs, det_max_side=0):
+        preds = self.getModel("ocr").predict(imgs, **detLimitParams(det_max_side))
+        results = []
+        for result in preds:
+            results.append(
+                [
+                    [toList(poly), (text, score)]
+                    for poly, text, score in zip(
+                        result["rec_polys"], result["rec_texts"], result["rec_scores"]
+                    )
+                ]
+            )
+        return results
+
+    def table(self, img, det_max_side=0):
+        res = self.getModel("table").predict(img, **detLimitParams(det_max_side))[0]
+        if res is None:
+            return None
+        return {
+            "table_res_list": [
+                {
+                    "table_ocr_pred": {
+                        "rec_boxes": toList(region["table_ocr_pred"]["rec_boxes"]),
+                        "rec_texts": list(region["table_ocr_pred"]["rec_texts"]),
+                    },
+                    "pred_html": region["pred_html"],
+                }
+                for region in res["table_res_list"]
+            ]
+        }
+
+
+class StubBackend(InferenceBackend):
+    """
+    Deterministic engine without model weights, for benchmarking and load testing the
+    labelling pipeline. Results depend only on the image content: the image is cut into
+    a few text lines whose transcription is derived from the pixel hash. latency_ms is
+    slept per call to stand in for model time.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000.0
+
+    @staticmethod
+    def _digest(img):
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(str(img.shape).encode("ascii"))
+        digest.update(memoryview(np.ascontiguousarray(img)))
+        return digest.hexdigest()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def detect(self, img):
+        self._wait()
+        h, w = img.shape[:2]
+        lines = 1 + int(self._digest(img)[:2], 16) % 6
+        step = h / lines
+        margin_x, margin_y = int(w * 0.05), int(step * 0.2)
+        polys = []
+        for i in range(lines):
+            top, bottom = int(i * step) + margin_y, int((i + 1) * step) - margin_y
+            if bottom <= top:
+                continue
+            polys.append(
+                [
+                    [margin_x, top],
+                    [w - 1 - margin_x, top],
+                    [w - 1 - margin_x, bottom],
+                    [margin_x, bottom],
+                ]
+            )
+        return polys
+
+    def recognize(self, img):
+        self._wait()
+        digest = self._digest(img)
+        return {
+            "rec_text": "stub " + digest[:6],
+            "rec_score": 0.5 + int(digest[6:8], 16) / 512.0,
+        }
+
+    def ocr(self, imgs, det_max_side=0):
+        results = []
+        for img in imgs:
+            result_dic = []
+            for poly in self.detect(img):
+                (x1, y1), (x2, y2) = poly[0], poly[2]
+                rec = self.recognize(img[y1:y2, x1:x2])
+                result_dic.append([poly, (rec["rec_text"], rec["rec_score"])])
+            results.append(result_dic)
+        return results
+
+    def table(self, img, det_max_side=0):
+        self._wait()
+        h, w = img.shape[:2]
+        digest = self._digest(img)
+        rows, cols = 2, 2
+        boxes, texts, html = [], [], ""
+        for r in range(rows):
+            html += "<tr>"
+            for c in range(cols):
+                box = [
+                    c * w // cols,
+                    r * h // rows,
+                    (c + 1) * w // cols,
+                    (r + 1) * h // rows,
+                ]
+                text = "%s-%d%d" % (digest[:4], r, c)
+                boxes.append(box)
+                texts.append(text)
+                html += "<td>%s</td>" % text
+            html += "</tr>"
+        return {
+            "table_res_list": [
+                {
+                    "table_ocr_pred": {"rec_boxes": boxes, "rec_texts": texts},
+                    "pred_html": "<html><body><table>%s</table></body></html>" % html,
+                }
+            ]
+        }
+
+
+def createBackend(name, getModel=None, latency_ms=0):
+    if name == "paddle":
+        return PaddleBackend(getModel)
+    if name == "stub":
+        return StubBackend(latency_ms)
+    raise ValueError("Unknown inference backend %s" % name)
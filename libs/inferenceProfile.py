@@ -0,0 +1,216 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import time
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+logger = logging.getLogger("PPOCRLabel")
+
+TUNED_PROFILE_PATH = os.path.join(
+    os.path.expanduser("~"), ".PPOCRLabel", "inference_profiles.json"
+)
+
+# CPU inference settings: MKLDNN, inference threads (None lets paddle decide either) and
+# the number of images auto recognition feeds to the pipeline at once
+INFERENCE_PROFILES = {
+    # paddleocr's own defaults, one image at a time
+    "default": {"enable_mkldnn": None, "cpu_threads": None, "batch_size": 1},
+    # one image as fast as possible, for re-recognition and look-ahead
+    "latency": {"enable_mkldnn": True, "cpu_threads": "all", "batch_size": 1},
+    # most images per second for long auto recognition runs
+    "throughput": {"enable_mkldnn": True, "cpu_threads": "all", "batch_size": 8},
+    # MKLDNN caches kernels per input shape, which grows memory on mixed image sizes
+    "low-memory": {"enable_mkldnn": False, "cpu_threads": 2, "batch_size": 1},
+}
+# models and text line orientation stage of the OCR pipeline. mobile is several times
+# faster and loses little accuracy on clean printed documents
+SPEED_PROFILES = {
+    "server": {
+        "text_detection_model_name": "PP-OCRv5_server_det",
+        "text_recognition_model_name": "PP-OCRv5_server_rec",
+        "use_textline_orientation": True,
+    },
+    "mobile": {
+        "text_detection_model_name": "PP-OCRv5_mobile_det",
+        "text_recognition_model_name": "PP-OCRv5_mobile_rec",
+        "use_textline_orientation": False,
+    },
+}
+
+# auto is the tuned profile of this machine if autotune was run here, default otherwise
+PROFILE_NAMES = ("auto", "tuned") + tuple(INFERENCE_PROFILES)
+
+
+def loadTunedProfile(path=TUNED_PROFILE_PATH):
+    """The configuration autotune saved for this machine, None if there is none"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get(platform.node())
+    except (OSError, ValueError):
+        return None
+
+
+def saveTunedProfile(config, path=TUNED_PROFILE_PATH):
+    profiles = {}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                profiles = json.load(f)
+        except ValueError:
+            logger.warning("Overwriting broken inference profile file %s", path)
+    profiles[platform.node()] = config
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(profiles, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def resolveProfile(name):
+    """Concrete settings of the profile name, see INFERENCE_PROFILES"""
+    if name in ("auto", "tuned"):
+        tuned = loadTunedProfile()
+        if tuned is not None:
+            return {k: tuned[k] for k in ("enable_mkldnn", "cpu_threads", "batch_size")}
+        if name == "tuned":
+            logger.warning("No tuned inference profile for this machine, run autotune")
+        name = "default"
+    profile = dict(INFERENCE_PROFILES[name])
+    if profile["cpu_threads"] == "all":
+        profile["cpu_threads"] = os.cpu_count() or 1
+    return profile
+
+
+def modelSummary(params):
+    """Short description of the models an OCR pipeline is built from"""
+    det = params.get("text_detection_model_name", "default det")
+    rec = params.get("text_recognition_model_name", "%s rec" % params.get("lang"))
+    orientation = "on" if params.get("use_textline_orientation") else "off"
+    return "%s + %s, orientation %s" % (det, rec, orientation)
+
+
+def candidateConfigs(cpu_count=None):
+    """Configurations autotune compares"""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    threads = sorted({max(1, cpu_count // 2), cpu_count})
+    return [
+        {"enable_mkldnn": mkldnn, "cpu_threads": n, "batch_size": batch}
+        for mkldnn in (False, True)
+        for n in threads
+        for batch in (1, 4)
+    ]
+
+
+def autotune(base_params, img_paths, num_samples=8, log=logger.info):
+    """
+    Time every candidate configuration on up to num_samples images and return the fastest
+    as a tuned profile. base_params are the PaddleOCR arguments without the CPU settings.
+    Pipelines are built once per MKLDNN/thread setting, batch sizes reuse them.
+    """
+    import cv2
+    import numpy as np
+    from paddleocr import PaddleOCR
+
+    step = max(1, len(img_paths) // num_samples)
+    images = []
+    for img_path in img_paths[::step][:num_samples]:
+        img = cv2.imdecode(np.fromfile(img_path, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is not None:
+            images.append(img)
+    if not images:
+        raise ValueError("No readable images to benchmark")
+
+    results = []
+    candidates = candidateConfigs()
+    built = {}
+    for config in candidates:
+        build_key = (config["enable_mkldnn"], config["cpu_threads"])
+        if build_key not in built:
+            built.clear()  # one pipeline in memory at a time
+            params = dict(
+                base_params,
+                enable_mkldnn=config["enable_mkldnn"],
+                cpu_threads=config["cpu_threads"],
+            )
+            ocr = PaddleOCR(**params)
+            ocr.predict(images[0])  # warm-up
+            built[build_key] = ocr
+        ocr = built[build_key]
+        batch = config["batch_size"]
+        start = time.perf_counter()
+        for i in range(0, len(images), batch):
+            ocr.predict(images[i : i + batch])
+        speed = len(images) / (time.perf_counter() - start)
+        results.append(dict(config, images_per_second=round(speed, 3)))
+        log("Autotune %s: %.2f images/s" % (json.dumps(config), speed))
+
+    best = max(results, key=lambda r: r["images_per_second"])
+    best = dict(
+        best,
+        tuned_at=datetime.datetime.now().isoformat(timespec="seconds"),
+        samples=len(images),
+    )
+    return best, results
+
+
+class AutotuneWorker(QThread):
+    """Runs autotune in the background and saves the result for this machine"""
+
+    progress = pyqtSignal(str)
+    tuned = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, base_params, img_paths, num_samples=8):
+        super(AutotuneWorker, self).__init__()
+        self.base_params = base_params
+        self.img_paths = img_paths
+        self.num_samples = num_samples
+
+    def run(self):
+        try:
+            best, _ = autotune(
+                self.base_params, self.img_paths, self.num_samples, self.progress.emit
+            )
+            saveTunedProfile(best)
+        except Exception as e:
+            logger.error("Autotune failed: %s", e)
+            self.failed.emit(str(e))
+            return
+        self.tuned.emit(best)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark CPU inference settings on this machine and save the fastest"
+    )
+    parser.add_argument("image_dir", type=str, help="directory with sample images")
+    parser.add_argument("--lang", type=str, default="ch")
+    parser.add_argument("--samples", type=int, default=8)
+    parser.add_argument(
+        "--speed_profile", type=str, default="server", choices=tuple(SPEED_PROFILES)
+    )
+    args = parser.parse_args()
+
+    exts = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+    img_paths = sorted(
+        os.path.join(args.image_dir, name)
+        for name in os.listdir(args.image_dir)
+        if name.lower().endswith(exts)
+    )
+    base_params = {
+        "use_doc_orientation_classify": False,
+        "use_doc_unwarping": False,
+        "device": "cpu",
+        "lang": args.lang,
+        **SPEED_PROFILES[args.speed_profile],
+    }
+    best, _ = autotune(base_params, img_paths, args.samples, log=print)
+    saveTunedProfile(best)
+    print("Saved %s to %s" % (json.dumps(best), TUNED_PROFILE_PATH))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import argparse
+import ast
+import contextlib
+import gc
+import json
+import logging
+import os
+import random
+import string
+import tempfile
+import time
+
+logger = logging.getLogger("PPOCRLabel")
+
+# orjson parses label lines several times faster when it is installed, the files are
+# always written with the standard json module so their bytes do not depend on it
+try:
+    import orjson
+
+    _loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    _loads = json.loads
+    JSON_BACKEND = "json"
+
+
+def parseLabel(text):
+    """
+    The annotation list of one Label.txt/Cache.cach line. PPOCRLabel writes JSON; lines in
+    Python literal syntax from older tools are read with ast.literal_eval, never eval.
+    """
+    text = text.strip()
+    if not text:
+        return []
+    try:
+        return _loads(text)
+    except ValueError:
+        return ast.literal_eval(text)
+
+
+def formatLine(key, label):
+    """One Label.txt/Cache.cach line including the newline"""
+    return key + "\t" + json.dumps(label, ensure_ascii=False) + "\n"
+
+
+class LabelDict(dict):
+    """
+    {image key: annotation list} of a label file. unparsed holds the lines of the file
+    that could not be read, writeLabelFile writes them back as they are.
+    """
+
+    def __init__(self, *args, unparsed=(), **kwargs):
+        super(LabelDict, self).__init__(*args, **kwargs)
+        self.unparsed = list(unparsed)
+
+
+def copyLabels(labels):
+    """A LabelDict copy of labels that keeps their unparsed lines"""
+    return LabelDict(labels, unparsed=getattr(labels, "unparsed", ()))
+
+
+@contextlib.contextmanager
+def pausedGC():
+    """
+    Disable the garbage collector in the with block while label text is parsed. Parsed
+    JSON holds no reference cycles, but the millions of new containers would trigger
+    full garbage collections that rescan everything loaded so far.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def iterLabelFile(path, unparsed=None):
+    """
+    Yield (image key, annotation list) for every line of a label file, reading one line
+    at a time. Lines that can not be parsed are logged and skipped, they are appended to
+    the list unparsed without the newline if it is given.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            key, sep, label = line.partition("\t")
+            if not sep:
+                logger.warning("%s:%d has no tab, kept as it is", path, lineno)
+                if unparsed is not None:
+                    unparsed.append(line.rstrip("\n"))
+                continue
+            try:
+                yield key, parseLabel(label)
+            except (ValueError, SyntaxError) as e:
+                logger.warning(
+                    "%s:%d can not be parsed, kept as it is: %s", path, lineno, e
+                )
+                if unparsed is not None:
+                    unparsed.append(line.rstrip("\n"))
+
+
+def readLabelFile(path):
+    """
+    LabelDict {image key: annotation list} of a label file, later lines win. Lines that
+    can not be parsed are in its unparsed list.
+    """
+    with pausedGC():
+        unparsed = []
+        labels = LabelDict(iterLabelFile(path, unparsed))
+        labels.unparsed = unparsed
+        return labels
+
+
+def writeLabelFile(path, labels):
+    """
+    Write {image key: annotation list} so that a crash never leaves a partial file. The
+    unparsed lines of a LabelDict follow the records, except those of an image that has
+    a record now.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for key, label in labels.items():
+            f.write(formatLine(key, label))
+        for line in getattr(labels, "unparsed", ()):
+            key, sep, _ = line.partition("\t")
+            if not sep or key not in labels:
+                f.write(line + "\n")
+    os.replace(tmp_path, path)
+
+
+def writeStateFile(path, states):
+    """Write fileState.txt from {image key: state} the same way as writeLabelFile"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for key, state in states.items():
+            f.write(key + "\t" + str(state) + "\n")
+    os.replace(tmp_path, path)
+
+
+def syntheticLabels(num_lines, boxes_per_image=8, seed=0):
+    """Label.txt content that looks like real annotations, for the benchmark"""
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_letters, k=6)) for _ in range(500)]
+    words += ["true", "false", "null", "发票", "金额", "合计"]
+    labels = {}
+    for i in range(num_lines):
+        boxes = []
+        for _ in range(boxes_per_image):
+            x, y = rng.randint(0, 1800), rng.randint(0, 2400)
+            boxes.append(
+                {
+                    "transcription": " ".join(rng.choices(words, k=3)),
+                    "points": [[x, y], [x + 200, y], [x + 200, y + 40], [x, y + 40]],
+                    "difficult": False,
+                }
+            )
+        labels["images/%07d.jpg" % i] = boxes
+    return labels
+
+
+def _legacyParse(path):
+    # the string replace and eval parser this module replaced, kept for the benchmark
+    labeldict = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for each in f.readlines():
+            file, label = each.split("\t")
+            label = label.replace("false", "False")
+            label = label.replace("true", "True")
+            label = label.replace("null", "None")
+            labeldict[file] = eval(label)
+    return labeldict
+
+
+def benchmark(num_lines=200000):
+    """Seconds each parser takes on a synthetic label file of num_lines lines"""
+    global _loads
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "Label.txt")
+        writeLabelFile(path, syntheticLabels(num_lines))
+        timings["file_mb"] = os.path.getsize(path) / 1048576
+
+        gc.collect()
+        start = time.perf_counter()
+        _legacyParse(path)
+        timings["eval (old)"] = time.perf_counter() - start
+
+        accelerated = _loads
+        _loads = json.loads
+        try:
+            gc.collect()
+            start = time.perf_counter()
+            readLabelFile(path)
+            timings["json"] = time.perf_counter() - start
+        finally:
+            _loads = accelerated
+        if JSON_BACKEND != "json":
+            gc.collect()
+            start = time.perf_counter()
+            readLabelFile(path)
+            timings[JSON_BACKEND] = time.perf_counter() - start
+
+        # streaming keeps one line in memory, time to the first record and the whole pass
+        gc.collect()
+        start = time.perf_counter()
+        records = iterLabelFile(path)
+        next(records)
+        timings["stream first record"] = time.perf_counter() - start
+        for _ in records:
+            pass
+        timings["stream all"] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the label file parsers on a synthetic Label.txt"
+    )
+    parser.add_argument("--lines", type=int, default=200000)
+    args = parser.parse_args()
+
+    timings = benchmark(args.lines)
+    print("%d lines, %.1f MB" % (args.lines, timings.pop("file_mb")))
+    first = timings.pop("stream first record")
+    for name, seconds in timings.items():
+        print("  %-22s %8.3f s %12.0f lines/s" % (name, seconds, args.lines / seconds))
+    print("  %-22s %8.3f s" % ("stream first record", first))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+import json
+import logging
+import mmap
+import os
+from collections.abc import Mapping, MutableMapping
+
+from libs.labelCodec import parseLabel, pausedGC
+from libs.sessionSnapshot import fileSignature
+
+logger = logging.getLogger("PPOCRLabel")
+
+# Label.txt files from this size on are read lazily instead of parsed at once
+LAZY_LOAD_MB = 32
+# bumped whenever the layout of the .idx file changes
+INDEX_VERSION = 3
+# records LazyLabels.items parses at a time with the garbage collector paused
+ITEMS_BATCH = 1000
+
+
+def isLargeLabelFile(path):
+    """True if path exists and is large enough to be read lazily"""
+    return os.path.exists(path) and os.path.getsize(path) >= LAZY_LOAD_MB * 1048576
+
+
+def buildIndex(path, unparsed=None):
+    """
+    {image key: (start, end)} byte range of the label text of every line of path. Lines
+    without a tab are appended to the list unparsed if it is given.
+    """
+    index = {}
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return index
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            pos = 0
+            while pos < size:
+                end = mm.find(b"\n", pos)
+                if end == -1:
+                    end = size
+                tab = mm.find(b"\t", pos, end)
+                if tab != -1:
+                    # a repeated key keeps its position and takes the later record
+                    index[mm[pos:tab].decode("utf-8")] = (tab + 1, end)
+                elif unparsed is not None and mm[pos:end].strip():
+                    unparsed.append(mm[pos:end].decode("utf-8"))
+                pos = end + 1
+    return index
+
+
+class LabelFileIndex(Mapping):
+    """
+    Read-only {image key: annotation list} view of a label file that parses a record only
+    when it is asked for. Records are read through a memory map of the file using a byte
+    offset index, which is stored as JSON next to the file as path + ".idx" so that the
+    next open skips the scan. The file is only mapped while records are read, so it can be
+    replaced.
+    unparsed are the lines of the file without a tab, which are not records. A record that
+    can not be parsed reads as [] and its key is added to broken, it stays in the file as
+    it is.
+    """
+
+    def __init__(self, path, index=None, unparsed=None):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.signature = fileSignature(path)
+        if index is None:
+            index, unparsed = self._loadIndex()
+            if index is None:
+                unparsed = []
+                index = buildIndex(path, unparsed)
+                self._saveIndex(index, unparsed)
+        else:
+            # the index of a file that was just written
+            unparsed = unparsed if unparsed is not None else []
+            self._saveIndex(index, unparsed)
+        self.index = index
+        self.unparsed = unparsed
+        self.broken = set()
+
+    def _loadIndex(self):
+        # JSON, never pickle: the index sits in the image directory, which may be shared
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # JSON has no tuples, the signature is stored as a list
+            signature = tuple(data["signature"])
+            if data.get("version") != INDEX_VERSION or signature != self.signature:
+                return None, None
+            return data["index"], data["unparsed"]
+        except FileNotFoundError:
+            return None, None
+        except Exception as e:
+            logger.warning("Ignoring broken label index %s: %s", self.index_path, e)
+            return None, None
+
+    def _saveIndex(self, index, unparsed):
+        data = {
+            "version": INDEX_VERSION,
+            "signature": self.signature,
+            "index": index,
+            "unparsed": unparsed,
+        }
+        try:
+            with open(self.index_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(self.index_path + ".tmp", self.index_path)
+        except OSError as e:
+            logger.warning("Can not store the label index %s: %s", self.index_path, e)
+
+    def _checkFile(self):
+        if fileSignature(self.path) != self.signature:
+            logger.warning("%s changed on disk, indexing it again", self.path)
+            self.signature = fileSignature(self.path)
+            self.unparsed = []
+            self.index = buildIndex(self.path, self.unparsed)
+            self._saveIndex(self.index, self.unparsed)
+
+    def rawRecords(self, keys):
+        """Yield (key, label text) of keys, None for keys not in the file, mapping it once"""
+        self._checkFile()
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                for key in keys:
+                    yield key, None
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for key in keys:
+                    span = self.index.get(key)
+                    if span is None:
+                        yield key, None
+                    else:
+                        yield key, mm[span[0] : span[1]].decode("utf-8")
+
+    def rawText(self, key):
+        """The label text of key as it is in the file"""
+        for _, raw in self.rawRecords([key]):
+            return raw
+
+    def parseRecord(self, key, raw):
+        """The annotation list of the label text raw of key, [] if it can not be parsed"""
+        try:
+            return parseLabel(raw)
+        except (ValueError, SyntaxError) as e:
+            if key not in self.broken:
+                logger.warning(
+                    "%s in %s can not be parsed, kept as it is: %s", key, self.path, e
+                )
+                self.broken.add(key)
+            return []
+
+    def isEmptyRecord(self, key):
+        # "[]", possibly followed by \r, the shortest non-empty list is longer
+        start, end = self.index[key]
+        return end - start <= 3 and self.rawText(key).strip() == "[]"
+
+    def __getitem__(self, key):
+        if key not in self.index:
+            raise KeyError(key)
+        return self.parseRecord(key, self.rawText(key))
+
+    def items(self):
+        return (
+            (key, self.parseRecord(key, raw))
+            for key, raw in self.rawRecords(list(self.index))
+        )
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+
+class LazyLabels(MutableMapping):
+    """
+    PPlabel of a large Label.txt: records come from a LabelFileIndex and are parsed when
+    they are used, only the images changed in this session are held in memory.
+    defaults are the records of images Label.txt does not have, e.g. from Cache.cach.
+    """
+
+    def __init__(self, base, defaults=None):
+        self.base = base
+        self.defaults = defaults if defaults is not None else {}
+        self.changes = {}
+        self.deleted = set()
+
+    def __getitem__(self, key):
+        if key in self.deleted:
+            raise KeyError(key)
+        if key in self.changes:
+            return self.changes[key]
+        if key in self.base:
+            return self.base[key]
+        return self.defaults[key]
+
+    def __setitem__(self, key, label):
+        self.deleted.discard(key)
+        self.changes[key] = label
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.changes.pop(key, None)
+        self.deleted.add(key)
+
+    def __contains__(self, key):
+        if key in self.deleted:
+            return False
+        return key in self.changes or key in self.base or key in self.defaults
+
+    def __iter__(self):
+        seen = set()
+        for source in (self.base, self.defaults, self.changes):
+            for key in source:
+                if key not in seen and key not in self.deleted:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def items(self):
+        """
+        (key, annotation list) in iteration order. The unchanged records are read from the
+        base file in one pass instead of mapping it once per key.
+        """
+        keys = [(key, self.isUnchanged(key)) for key in self]
+        records = self.base.rawRecords([key for key, unchanged in keys if unchanged])
+        try:
+            for start in range(0, len(keys), ITEMS_BATCH):
+                # the caller's loop body runs with the garbage collector enabled
+                with pausedGC():
+                    batch = [
+                        (
+                            (key, self.base.parseRecord(*next(records)))
+                            if unchanged
+                            else (key, self[key])
+                        )
+                        for key, unchanged in keys[start : start + ITEMS_BATCH]
+                    ]
+                yield from batch
+        finally:
+            records.close()
+
+    def isUnchanged(self, key):
+        """True if the record of key is the one in the base file"""
+        return key not in self.deleted and key not in self.changes and key in self.base
+
+    def rawText(self, key):
+        """Label text of key in the base file if it is unchanged, None otherwise"""
+        return self.base.rawText(key) if self.isUnchanged(key) else None
+
+    def isEmpty(self, key):
+        if self.isUnchanged(key):
+            return self.base.isEmptyRecord(key)
+        return self[key] == []
+
+    def writeFile(self, keys):
+        """
+        Write the records of keys as the new base file and read from it from then on.
+        Unchanged records are copied as they are, without being parsed. Records that can
+        not be parsed and the lines without a tab are written back as they are, too, as
+        long as they are unchanged.
+        """
+        keys = list(keys)
+        selected = set(keys)
+        # records of the old file that are not written stay available in memory
+        kept = [
+            key
+            for key in self.base
+            if key not in selected
+            and key not in self.changes
+            and key not in self.deleted
+        ]
+        for key, raw in self.base.rawRecords(kept):
+            label = self.base.parseRecord(key, raw)
+            if key in self.base.broken:
+                keys.append(key)
+            else:
+                self.changes[key] = label
+
+        path = self.base.path
+        index = {}
+        with open(path + ".tmp", "wb") as f:
+            pos = 0
+            for key, raw in self.base.rawRecords(keys):
+                if raw is None or not self.isUnchanged(key):
+                    raw = json.dumps(self[key], ensure_ascii=False)
+                head = (key + "\t").encode("utf-8")
+                body = raw.encode("utf-8")
+                f.write(head + body + b"\n")
+                index[key] = (pos + len(head), pos + len(head) + len(body))
+                pos += len(head) + len(body) + 1
+            for line in self.base.unparsed:
+                f.write(line.encode("utf-8") + b"\n")
+        os.replace(path + ".tmp", path)
+        self.base = LabelFileIndex(path, index, self.base.unparsed)
+        for key in keys:
+            self.changes.pop(key, None)
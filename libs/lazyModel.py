@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from libs.startupProfiler import STARTUP_PROFILER
+
+logger = logging.getLogger("PPOCRLabel")
+
+
+class LazyModel(object):
+    """
+    A model that is built on first use. get() builds it in the calling thread, ModelLoader
+    builds it ahead of time in the background; ready tells whether get() would block.
+    warmup_input is predicted once on the fresh model so the first real prediction is fast.
+    """
+
+    def __init__(self, name, factory, warmup_input=None):
+        self.name = name
+        self.factory = factory
+        self.warmup_input = warmup_input
+        self.error = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._model is not None
+
+    def get(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.time()
+                    model = STARTUP_PROFILER.timed("build " + self.name, self.factory)()
+                    if self.warmup_input is not None:
+                        try:
+                            STARTUP_PROFILER.timed(
+                                "warm-up " + self.name, model.predict
+                            )(self.warmup_input)
+                        except Exception as e:
+                            logger.warning("Warm-up of %s failed: %s", self.name, e)
+                    logger.info("Loaded %s in %.1fs", self.name, time.time() - start)
+                    self._model = model
+        return self._model
+
+
+class ModelLoader(QThread):
+    """Background thread that builds queued LazyModels one after another"""
+
+    modelLoaded = pyqtSignal(object)
+    modelFailed = pyqtSignal(object, str)
+
+    def __init__(self):
+        super(ModelLoader, self).__init__()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._active = False
+
+    def load(self, models, first=False):
+        """Queue models that are not built yet, first=True puts them ahead of the queue"""
+        with self._lock:
+            todo = [m for m in models if not m.ready]
+            if first:
+                self._pending = todo + [m for m in self._pending if m not in todo]
+            else:
+                self._pending.extend(m for m in todo if m not in self._pending)
+            start = bool(self._pending) and not self._active
+            if start:
+                self._active = True
+        if start:
+            # the previous run may still be returning
+            self.wait()
+            self.start(QThread.LowPriority)
+
+    def stop(self):
+        """Drop the queued models and wait for the one being built"""
+        with self._lock:
+            self._pending = []
+        self.wait()
+
+    def run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._active = False
+                    return
+                model = self._pending.pop(0)
+            try:
+                model.get()
+                self.modelLoaded.emit(model)
+            except Exception as e:
+                model.error = str(e)
+                logger.error("Can not load %s: %s", model.name, e)
+                self.modelFailed.emit(model, str(e))
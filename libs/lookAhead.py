@@ -0,0 +1,85 @@
+import logging
+import threading
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from libs.imagePrefetcher import readImage
+from libs.ocrPool import recognizeLoaded
+
+logger = logging.getLogger("PPOCRLabel")
+
+
+class LookAheadWorker(QThread):
+    """
+    Low priority thread that recognises the images the annotator is about to open.
+    schedule() replaces the pending images, so work queued for a direction the annotator
+    turned away from is dropped; only the image in flight is finished.
+    ocr is the InferenceBackend, None while its OCR pipeline is still loading.
+    """
+
+    resultValue = pyqtSignal(str, object)
+
+    def __init__(self, ocr, cache=None, model_id=None, det_max_side=0):
+        super(LookAheadWorker, self).__init__()
+        self.ocr = ocr
+        self.cache = cache
+        self.model_id = model_id
+        self.det_max_side = det_max_side
+        self._cond = threading.Condition()
+        self._pending = []
+        self._busy = False
+        self._stopped = False
+
+    def setModel(self, ocr, model_id):
+        with self._cond:
+            self.ocr = ocr
+            self.model_id = model_id
+
+    def schedule(self, img_list):
+        with self._cond:
+            self._pending = list(img_list)
+            self._cond.notify()
+        if self._pending and not self.isRunning():
+            self.start(QThread.LowestPriority)
+
+    def cancel(self, wait=False):
+        """Drop pending images, with wait=True also block until the one in flight is done"""
+        with self._cond:
+            self._pending = []
+            if wait:
+                while self._busy:
+                    self._cond.wait()
+
+    def stop(self):
+        with self._cond:
+            self._pending = []
+            self._stopped = True
+            self._cond.notify_all()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                ocr, model_id = self.ocr, self.model_id
+                if ocr is None:
+                    # the pipeline is still loading, the next schedule() tries again
+                    self._pending = []
+                    continue
+                img_path = self._pending.pop(0)
+                self._busy = True
+            try:
+                loaded = readImage(img_path, self.cache, model_id)
+                result_dic = recognizeLoaded(
+                    ocr, [(img_path, loaded)], self.cache, self.det_max_side
+                )[0]
+                self.resultValue.emit(img_path, result_dic)
+            except Exception as e:
+                logger.error("Look-ahead recognition of %s failed: %s", img_path, e)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
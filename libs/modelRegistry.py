@@ -0,0 +1,222 @@
+import functools
+import logging
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+logger = logging.getLogger("PPOCRLabel")
+
+
+def residentMemory():
+    """Resident memory of this process in bytes, None when it can not be measured"""
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def resolveDevice(device):
+    """
+    The device paddle models are built on: "gpu" becomes "cpu" when paddle has no CUDA.
+    Importing paddle is slow, so this is only called where models are built, which is
+    off the UI thread.
+    """
+    if device != "gpu":
+        return device
+    try:
+        import paddle
+    except ImportError:
+        return "cpu"
+    return "gpu" if paddle.is_compiled_with_cuda() else "cpu"
+
+
+def buildModel(factory, config):
+    """factory(**config) with the device of config resolved"""
+    if config.get("device") is not None:
+        config = dict(config, device=resolveDevice(config["device"]))
+    return factory(**config)
+
+
+def formatMemory(size):
+    if size is None:
+        return "unknown"
+    return "%.0f MB" % (size / 1048576)
+
+
+class SharedModel(object):
+    """
+    A model handed out by ModelRegistry. Paddle predictors are not thread safe, so calls
+    from the UI, look-ahead and auto recognition threads are serialised on one lock, which
+    is also shared by the predictors that live inside a pipeline.
+    """
+
+    def __init__(self, model, lock=None):
+        self.model = model
+        self.lock = lock if lock is not None else threading.RLock()
+
+    def predict(self, *args, **kwargs):
+        with self.lock:
+            return list(self.model.predict(*args, **kwargs))
+
+
+def pipelinePredictors(pipeline):
+    """
+    The text recognition predictor inside a SharedModel wrapping a PaddleOCR pipeline, as
+    {"rec": SharedModel} on the pipeline's lock. Empty if the pipeline layout is unknown;
+    paddleocr has no public accessor, so this looks at paddlex internals and degrades to
+    no sharing when they change.
+    The detection predictor is not shared: the pipeline configures it with its own
+    limit_side_len, limit_type and thresholds, so it does not behave like a standalone
+    TextDetection built from the same model.
+    """
+    inner = getattr(pipeline.model, "paddlex_pipeline", None)
+    inner = getattr(inner, "_pipeline", inner)
+    predictor = getattr(inner, "text_rec_model", None)
+    if predictor is None:
+        return {}
+    return {"rec": SharedModel(predictor, pipeline.lock)}
+
+
+# memory assumed for a model whose size could not be measured
+UNKNOWN_MODEL_BYTES = 1024 * 1048576
+
+RegistryEntry = namedtuple("RegistryEntry", "name model memory owner evictable")
+
+
+class ModelRegistry(object):
+    """
+    Process-wide store of built models keyed by kind, model name/dir and device, so the
+    same weights are loaded once no matter how many features use them. The resident memory
+    each model added when it was built is kept for memoryReport().
+    Models registered as evictable, like the per-language OCR pipelines, are kept up to
+    budget_mb in total and dropped least recently used first; pinned models always stay.
+    """
+
+    def __init__(self, budget_mb=None):
+        self._lock = threading.Lock()
+        self._build_lock = threading.RLock()
+        # key -> RegistryEntry, least recently used first
+        self._entries = OrderedDict()
+        self._pinned = set()
+        self.setBudget(budget_mb)
+
+    @staticmethod
+    def makeKey(kind, **config):
+        return (kind,) + tuple(
+            sorted((k, v) for k, v in config.items() if v is not None)
+        )
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def setBudget(self, budget_mb):
+        """Memory budget of the evictable models, None means unlimited"""
+        with self._lock:
+            self.budget_bytes = None if budget_mb is None else int(budget_mb * 1048576)
+            self._enforceBudget()
+
+    def get(self, key, factory=None, name=None, evictable=False):
+        """The model registered under key, built with factory if it is not there yet"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            if factory is None:
+                raise KeyError(key)
+            # builds are rare and heavy, one at a time keeps the memory figures apart
+            with self._build_lock:
+                with self._lock:
+                    entry = self._entries.get(key)
+                if entry is None:
+                    before = residentMemory()
+                    model = SharedModel(factory())
+                    after = residentMemory()
+                    memory = None
+                    if before is not None and after is not None:
+                        memory = max(0, after - before)
+                    entry = RegistryEntry(
+                        name or key[0], model, memory, None, evictable
+                    )
+                    logger.info("Model %s uses %s", entry.name, formatMemory(memory))
+                    with self._lock:
+                        self._entries[key] = entry
+                        # the new model is the most recent one and is never dropped here
+                        self._enforceBudget(keep=key)
+        return entry.model
+
+    def share(self, key, model, owner_key, name=None):
+        """Register a model that lives inside the model under owner_key"""
+        with self._lock:
+            if key in self._entries or owner_key not in self._entries:
+                return
+            self._entries[key] = RegistryEntry(
+                name or key[0], model, 0, owner_key, False
+            )
+
+    def pin(self, key):
+        """Keep key out of eviction, used for the models the window works with"""
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key):
+        with self._lock:
+            self._pinned.discard(key)
+            self._enforceBudget()
+
+    def discard(self, key):
+        """Forget a model and the models shared from it, callers may still hold them"""
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key):
+        if self._entries.pop(key, None) is None:
+            return
+        self._pinned.discard(key)
+        for k in [k for k, e in self._entries.items() if e.owner == key]:
+            del self._entries[k]
+
+    def _enforceBudget(self, keep=None):
+        if self.budget_bytes is None:
+            return
+        evictable = [
+            key
+            for key, e in self._entries.items()
+            if e.evictable and key not in self._pinned and key != keep
+        ]
+        used = sum(
+            UNKNOWN_MODEL_BYTES if e.memory is None else e.memory
+            for e in self._entries.values()
+            if e.evictable
+        )
+        for key in evictable:
+            if used <= self.budget_bytes:
+                break
+            entry = self._entries[key]
+            used -= UNKNOWN_MODEL_BYTES if entry.memory is None else entry.memory
+            self._discard(key)
+            logger.info("Dropped %s to stay within the model memory budget", entry.name)
+
+    def memoryReport(self):
+        """One line per registered model with the memory it added"""
+        lines = []
+        with self._lock:
+            for e in self._entries.values():
+                if e.owner is not None:
+                    owner = self._entries[e.owner].name
+                    lines.append("%s: shared with %s" % (e.name, owner))
+                else:
+                    lines.append("%s: %s" % (e.name, formatMemory(e.memory)))
+        return lines
+
+
+MODEL_REGISTRY = ModelRegistry()
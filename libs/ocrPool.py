@@ -0,0 +1,226 @@
+import logging
+import multiprocessing
+import os
+import time
+
+from libs.imagePrefetcher import readImage
+from libs.predictionCache import PredictionCache, pipelineIdentity
+
+logger = logging.getLogger("PPOCRLabel")
+
+# images with a side smaller than this are skipped by auto recognition
+MIN_IMAGE_SIDE = 32
+# how often OCRProcessPool.imap checks for a cancel while waiting for the workers
+POLL_SECONDS = 0.2
+
+
+def detLimitParams(det_max_side):
+    """
+    predict() arguments that shrink the detection input so its longer side is at most
+    det_max_side. The pipeline maps the polygons back and crops the text from the
+    original image, so recognition still sees full resolution. 0 keeps the input as is.
+    """
+    if not det_max_side:
+        return {}
+    return {"text_det_limit_side_len": det_max_side, "text_det_limit_type": "max"}
+
+
+def reportDownscale(task, shapes, det_max_side, elapsed):
+    """
+    Log how much detection input a downscaled pass saved. Nothing is timed at full
+    resolution: the saving is extrapolated from the pixel ratio and the elapsed time of
+    the whole pass, recognition included, so it is an estimate and an upper bound.
+    """
+    if not det_max_side:
+        return
+    full = reduced = 0
+    for shape in shapes:
+        h, w = shape[:2]
+        scale = min(1.0, det_max_side / max(h, w))
+        full += h * w
+        reduced += int(h * scale) * int(w * scale)
+    if reduced <= 0 or reduced >= full:
+        return
+    logger.info(
+        "%s: detection ran on %.0f%% of %.1f MP, pass took %.2fs, "
+        "estimated at most %.2fs saved (pixel ratio x pass time, not measured)",
+        task,
+        100.0 * reduced / full,
+        full / 1e6,
+        elapsed,
+        elapsed * (full / reduced - 1),
+    )
+
+
+def predictImages(backend, batch, det_max_side=0):
+    """
+    Run the OCR of an InferenceBackend once over a group of decoded images.
+    batch is a list of (img_path, img) pairs, the result holds one result_dic (or None) per pair.
+    With det_max_side larger scans are detected at a reduced size, see detLimitParams.
+    """
+    results = [None] * len(batch)
+    valid_idx = []
+    for i, (img_path, img) in enumerate(batch):
+        if (
+            img is not None
+            and img.shape[0] > MIN_IMAGE_SIDE
+            and img.shape[1] > MIN_IMAGE_SIDE
+        ):
+            valid_idx.append(i)
+        else:
+            logger.warning("The size of %s is too small to be recognised", img_path)
+    if not valid_idx:
+        return results
+
+    imgs = [batch[i][1] for i in valid_idx]
+    start = time.time()
+    preds = backend.ocr(imgs, det_max_side)
+    reportDownscale(
+        "Auto recognition",
+        [img.shape for img in imgs],
+        det_max_side,
+        time.time() - start,
+    )
+    for i, result_dic in zip(valid_idx, preds):
+        results[i] = result_dic
+    return results
+
+
+def recognizeLoaded(backend, loaded, cache=None, det_max_side=0):
+    """
+    Recognise a group of images produced by imagePrefetcher.readImage.
+    loaded is a list of (img_path, (img, cache_key, cached_result)); cached results are
+    returned as they are and fresh predictions are written back to the cache.
+    """
+    results = [None] * len(loaded)
+    todo = []
+    for i, (img_path, item) in enumerate(loaded):
+        if item is not None and item[2] is not None:
+            results[i] = item[2]
+        else:
+            todo.append(i)
+    if not todo:
+        return results
+
+    batch = [
+        (loaded[i][0], loaded[i][1][0] if loaded[i][1] is not None else None)
+        for i in todo
+    ]
+    for i, result_dic in zip(todo, predictImages(backend, batch, det_max_side)):
+        results[i] = result_dic
+        key = loaded[i][1][1] if loaded[i][1] is not None else None
+        if cache is not None and key is not None and result_dic is not None:
+            cache.put(key, result_dic)
+    return results
+
+
+# backend and cache owned by each worker process of OCRProcessPool
+_worker_backend = None
+_worker_cache = None
+_worker_model_id = None
+_worker_det_max_side = 0
+
+
+def _initWorker(params, cpu_threads, det_max_side, backend, cache_dir, cache_size_mb):
+    global _worker_backend, _worker_cache, _worker_model_id, _worker_det_max_side
+    _worker_det_max_side = det_max_side
+    if cache_dir is not None:
+        _worker_cache = PredictionCache(cache_dir, cache_size_mb)
+        _worker_model_id = pipelineIdentity(
+            "ocr", dict(params, det_max_side=det_max_side)
+        )
+    if backend is not None:
+        _worker_backend = backend
+        return
+    if cpu_threads:
+        os.environ["OMP_NUM_THREADS"] = str(cpu_threads)
+        params = dict(params, cpu_threads=cpu_threads)
+    try:
+        from paddleocr import PaddleOCR
+
+        from libs.inferenceBackend import PaddleBackend
+        from libs.modelRegistry import buildModel
+
+        _worker_backend = PaddleBackend(
+            {"ocr": buildModel(PaddleOCR, params)}.__getitem__
+        )
+    except Exception as e:
+        # raising here would make the pool respawn the worker forever
+        logger.error("Can not build OCR pipeline in worker %s: %s", os.getpid(), e)
+
+
+def _recognizeChunk(img_paths):
+    if _worker_backend is None:
+        raise RuntimeError("OCR pipeline is not available in worker %s" % os.getpid())
+    loaded = [
+        (img_path, readImage(img_path, _worker_cache, _worker_model_id))
+        for img_path in img_paths
+    ]
+    results = recognizeLoaded(
+        _worker_backend, loaded, _worker_cache, _worker_det_max_side
+    )
+    return list(zip(img_paths, results))
+
+
+class OCRProcessPool(object):
+    """
+    A pool of processes that each load their own PaddleOCR pipeline, so auto recognition
+    can use every CPU core. Images are handed out in chunks and results are returned in
+    the order the chunks finish. When a PredictionCache is given, every worker opens the
+    same cache file and skips images it already holds.
+    A picklable InferenceBackend given as backend is used by the workers instead of a
+    pipeline built from params.
+    """
+
+    def __init__(
+        self,
+        params,
+        num_workers,
+        cpu_threads=None,
+        cache=None,
+        det_max_side=0,
+        backend=None,
+    ):
+        self.num_workers = num_workers
+        self.closed = False
+        # paddle is not fork safe, always start from a fresh interpreter
+        ctx = multiprocessing.get_context("spawn")
+        cache_args = (None, None)
+        if cache is not None:
+            cache_args = (cache.cache_dir, cache.max_size_mb)
+        self._pool = ctx.Pool(
+            num_workers,
+            initializer=_initWorker,
+            initargs=(params, cpu_threads, det_max_side, backend) + cache_args,
+        )
+
+    def imap(self, img_list, chunk_size=1, stop=None):
+        """
+        Yield lists of (img_path, result_dic) as soon as each chunk is recognised.
+        Setting the threading.Event stop ends the iteration within POLL_SECONDS and kills
+        the chunks still in the workers.
+        """
+        chunks = [
+            img_list[i : i + chunk_size] for i in range(0, len(img_list), chunk_size)
+        ]
+        finished = False
+        try:
+            it = self._pool.imap_unordered(_recognizeChunk, chunks)
+            while stop is None or not stop.is_set():
+                try:
+                    group = it.next(timeout=POLL_SECONDS)
+                except multiprocessing.TimeoutError:
+                    continue
+                except StopIteration:
+                    finished = True
+                    break
+                yield group
+        finally:
+            if not finished:
+                # workers may still be busy with abandoned chunks
+                self.terminate()
+
+    def terminate(self):
+        if not self.closed:
+            self._pool.terminate()
+            self.closed = True
@@ -0,0 +1,221 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("PPOCRLabel")
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".PPOCRLabel", "pred_cache")
+
+# pipeline parameters that change what a model predicts for the same pixels
+IDENTITY_KEYS = (
+    "text_detection_model_name",
+    "text_detection_model_dir",
+    "text_recognition_model_name",
+    "text_recognition_model_dir",
+    "text_line_orientation_model_dir",
+    "use_textline_orientation",
+    "lang",
+    "det_max_side",
+)
+
+
+def pipelineIdentity(task, params):
+    """Short stable id of a model configuration, used as part of every cache key"""
+    items = []
+    for key in IDENTITY_KEYS:
+        value = params.get(key)
+        if value is None:
+            continue
+        if key.endswith("_dir") and os.path.exists(value):
+            # retrained weights saved into the same directory must not hit old entries
+            value = "%s@%d" % (os.path.abspath(value), int(os.path.getmtime(value)))
+        items.append([key, value])
+    identity = json.dumps([task, items], sort_keys=True)
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()[:16]
+
+
+class PredictionCache(object):
+    """
+    On-disk cache of model predictions keyed by image content hash and model identity,
+    so unchanged images are never run through the models twice. The cache is bounded by
+    max_size_mb and evicts the least recently used entries first.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size_mb=1024):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_size_mb = max_size_mb
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.path = os.path.join(cache_dir, "predictions.db")
+        self._lock = threading.Lock()
+        # shared by the UI and the auto recognition threads
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "key TEXT PRIMARY KEY, model TEXT, value TEXT, "
+            "size INTEGER, last_used REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_used ON predictions(last_used)"
+        )
+        # what each model id stands for, e.g. the speed profile that produced it
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS models (model TEXT PRIMARY KEY, description TEXT)"
+        )
+        self._conn.commit()
+        self._size = self.totalSize()
+
+    @staticmethod
+    def makeKey(data, model_id):
+        """data is the raw file content or the pixel array of the model input"""
+        digest = hashlib.blake2b(digest_size=20)
+        if hasattr(data, "shape"):
+            digest.update(str(data.shape).encode("ascii"))
+        digest.update(memoryview(data))
+        return digest.hexdigest() + "-" + model_id
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE predictions SET last_used = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        data = json.dumps(value, ensure_ascii=False)
+        model_id = key.rsplit("-", 1)[-1]
+        with self._lock:
+            # a replaced entry no longer counts towards the cache size
+            row = self._conn.execute(
+                "SELECT size FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)",
+                (key, model_id, data, len(data), time.time()),
+            )
+            self._conn.commit()
+            self._size += len(data) - (row[0] if row is not None else 0)
+            if self._size > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+
+    def describeModel(self, model_id, description):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO models VALUES (?, ?)", (model_id, description)
+            )
+            self._conn.commit()
+
+    def modelDescription(self, key):
+        """Description of the model that produced the entry under key, None if unknown"""
+        model_id = key.rsplit("-", 1)[-1]
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT description FROM models WHERE model = ?", (model_id,)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def report(self):
+        """(model id, description, entries, bytes) of every model with cached results"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT p.model, m.description, COUNT(*), SUM(p.size) "
+                "FROM predictions p LEFT JOIN models m ON p.model = m.model "
+                "GROUP BY p.model ORDER BY COUNT(*) DESC"
+            ).fetchall()
+
+    def totalSize(self):
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM predictions")
+        return row.fetchone()[0]
+
+    def _evict(self, target_bytes):
+        # other processes may write to the same file, so start from the real size
+        self._size = self.totalSize()
+        while self._size > target_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM predictions ORDER BY last_used LIMIT 256"
+            ).fetchall()
+            if not rows:
+                break
+            self._conn.executemany(
+                "DELETE FROM predictions WHERE key = ?", [(r[0],) for r in rows]
+            )
+            self._size -= sum(r[1] for r in rows)
+        self._conn.commit()
+
+    def prune(self, max_size_mb=None, max_age_days=None):
+        """Drop entries unused for max_age_days and shrink the cache to max_size_mb"""
+        with self._lock:
+            if max_age_days is not None:
+                self._conn.execute(
+                    "DELETE FROM predictions WHERE last_used < ?",
+                    (time.time() - max_age_days * 86400,),
+                )
+                self._conn.commit()
+            target = self.max_bytes if max_size_mb is None else max_size_mb * 1048576
+            self._evict(int(target))
+            self._conn.execute("VACUUM")
+            return self._size
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM predictions")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+            self._size = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Prune or report on the PPOCRLabel prediction cache"
+    )
+    parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max_size_mb", type=float, default=None)
+    parser.add_argument("--max_age_days", type=float, default=None)
+    parser.add_argument("--clear", action="store_true", help="remove every entry")
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="list the cached results per model and speed profile instead of pruning",
+    )
+    args = parser.parse_args()
+
+    cache = PredictionCache(args.cache_dir)
+    if args.report:
+        for model_id, description, entries, size in cache.report():
+            print(
+                "%s  %8d entries %8.1f MB  %s"
+                % (model_id, entries, size / 1048576, description or "unknown model")
+            )
+        cache.close()
+        return
+    before = cache.totalSize()
+    if args.clear:
+        cache.clear()
+    else:
+        cache.prune(max_size_mb=args.max_size_mb, max_age_days=args.max_age_days)
+    print(
+        "Prediction cache %s: %.1f MB -> %.1f MB"
+        % (cache.path, before / 1048576, cache.totalSize() / 1048576)
+    )
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
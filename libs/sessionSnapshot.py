@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import os
+import pickle
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from libs.labelCodec import copyLabels
+
+logger = logging.getLogger("PPOCRLabel")
+
+SNAPSHOT_DIR = os.path.join(os.path.expanduser("~"), ".PPOCRLabel", "sessions")
+# bumped whenever the stored layout changes, older snapshots are ignored
+SNAPSHOT_VERSION = 2
+
+
+def fileSignature(path):
+    """(mtime_ns, size) of path, None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class SessionSnapshot(object):
+    """
+    What opening a directory computes: the sorted image list, the check state of every
+    image and the parsed Label.txt, Cache.cach and fileState.txt. Each part is stored with
+    the signature of the directory or file it came from, so the next start only needs a
+    few stat calls to tell which parts can be used as they are.
+    The snapshot is written when the directory is closed and kept per directory under
+    ~/.PPOCRLabel/sessions.
+    """
+
+    def __init__(self, dirpath, snapshot_dir=SNAPSHOT_DIR):
+        self.dirpath = os.path.abspath(dirpath)
+        name = hashlib.sha1(self.dirpath.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(snapshot_dir, name + ".pkl")
+        # image list, the natural_sort setting it was sorted with and the directory
+        # signature it was listed at
+        self.img_list = None
+        self.natural_sort = None
+        self.dir_signature = None
+        # check state of img_list, valid while fileState.txt has done_signature
+        self.done = None
+        self.done_signature = None
+        # path -> (signature, parsed content) of the label files
+        self.label_files = {}
+
+    def load(self):
+        """Read the snapshot of the directory, False if there is no usable one"""
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning("Ignoring broken session snapshot %s: %s", self.path, e)
+            return False
+        if data.get("version") != SNAPSHOT_VERSION or data["dirpath"] != self.dirpath:
+            return False
+        self.img_list = data["img_list"]
+        self.natural_sort = data["natural_sort"]
+        self.dir_signature = data["dir_signature"]
+        self.done = data["done"]
+        self.done_signature = data["done_signature"]
+        self.label_files = data["label_files"]
+        return True
+
+    def save(self, img_list, natural_sort, dir_signature, done, done_signature):
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "dirpath": self.dirpath,
+            "img_list": img_list,
+            "natural_sort": natural_sort,
+            "dir_signature": dir_signature,
+            "done": done,
+            "done_signature": done_signature,
+            # label files changed by someone else since they were read are parsed again
+            "label_files": {
+                path: entry
+                for path, entry in self.label_files.items()
+                if entry[0] is not None and entry[0] == fileSignature(path)
+            },
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def imageList(self, natural_sort):
+        """The stored image list if it was sorted the same way, None otherwise"""
+        if self.img_list is None or self.natural_sort != natural_sort:
+            return None
+        return list(self.img_list)
+
+    def doneFlags(self, img_list, filestate_path):
+        """Check state of img_list if fileState.txt is unchanged, None otherwise"""
+        if (
+            self.done is None
+            or img_list != self.img_list
+            or fileSignature(filestate_path) != self.done_signature
+        ):
+            return None
+        return self.done
+
+    def labelFile(self, path):
+        """Parsed content of a label file if it is unchanged since it was stored"""
+        entry = self.label_files.get(path)
+        if entry is None or entry[0] is None or entry[0] != fileSignature(path):
+            return None
+        return copyLabels(entry[1])
+
+    def rememberLabelFile(self, path, content):
+        """Call right after path was read or written with content"""
+        self.label_files[path] = (fileSignature(path), copyLabels(content))
+
+
+class DirScanner(QThread):
+    """Lists a directory in the background to refresh an image list taken from a snapshot"""
+
+    scanned = pyqtSignal(str, object, object)
+
+    def __init__(self, dirpath, scan):
+        super(DirScanner, self).__init__()
+        self.dirpath = dirpath
+        self.scan = scan
+
+    def run(self):
+        # taken first, changes made while listing show up as a newer signature next time
+        signature = fileSignature(self.dirpath)
+        try:
+            images = self.scan(self.dirpath)
+        except OSError as e:
+            logger.error("Can not list %s: %s", self.dirpath, e)
+            return
+        self.scanned.emit(self.dirpath, signature, images)
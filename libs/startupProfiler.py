@@ -0,0 +1,95 @@
+import json
+import os
+import platform
+import threading
+import time
+from functools import wraps
+
+
+class StartupProfiler(object):
+    """
+    Wall and CPU time of the startup phases. The main thread calls mark(name) at the end
+    of each phase, so its phases follow each other without gaps; work on other threads or
+    deferred to the event loop is added with record() or timed(). CPU time is the time of
+    the thread that ran the phase. Nothing is recorded after finish().
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.records = []
+        self.finished = False
+        self.total = None
+        self._lock = threading.Lock()
+        self._last = (self.start, time.thread_time())
+
+    def mark(self, name):
+        """Close the main thread phase that ran since the previous mark"""
+        now = (time.perf_counter(), time.thread_time())
+        last, self._last = self._last, now
+        self.record(name, now[0] - last[0], now[1] - last[1])
+
+    def record(self, name, wall, cpu, thread=None):
+        with self._lock:
+            if self.finished:
+                return
+            self.records.append(
+                {
+                    "name": name,
+                    "wall_ms": round(wall * 1000, 1),
+                    "cpu_ms": round(cpu * 1000, 1),
+                    "thread": thread or threading.current_thread().name,
+                }
+            )
+
+    def timed(self, name, func):
+        """Wrap func so that its run is recorded as the phase name"""
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+        return wrapper
+
+    def finish(self):
+        with self._lock:
+            self.finished = True
+            self.total = time.perf_counter() - self.start
+
+    def report(self):
+        return {
+            "host": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "total_wall_ms": round((self.total or 0) * 1000, 1),
+            "phases": list(self.records),
+        }
+
+    def table(self):
+        lines = ["%-40s %10s %10s  %s" % ("phase", "wall ms", "cpu ms", "thread")]
+        for r in self.records:
+            lines.append(
+                "%-40s %10.1f %10.1f  %s"
+                % (r["name"], r["wall_ms"], r["cpu_ms"], r["thread"])
+            )
+        lines.append(
+            "%-40s %10.1f"
+            % ("total until all models are ready", self.report()["total_wall_ms"])
+        )
+        return "\n".join(lines)
+
+    def write(self, target):
+        """Print the table for target '-', otherwise write the JSON report to target"""
+        if target == "-":
+            print(self.table())
+            return
+        with open(target, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+# created on first import, PPOCRLabel imports this module before anything heavy
+STARTUP_PROFILER = StartupProfiler()
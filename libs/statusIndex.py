@@ -0,0 +1,80 @@
+import os
+import platform
+from collections import Counter
+from collections.abc import MutableMapping
+
+_SPLITER = "\\" if platform.system() == "Windows" else "/"
+
+# fileState.txt value of a confirmed image
+CHECKED = 1
+
+
+def imageKey(filePath):
+    """Label.txt key of an image: its directory name and file name joined by /"""
+    file_path_split = filePath.split(_SPLITER)[-2:]
+    if len(file_path_split) == 1:
+        return filePath
+    return file_path_split[0] + "/" + file_path_split[1]
+
+
+class StatusIndex(MutableMapping):
+    """
+    Check state of the images of a directory, {image key: state} like fileState.txt.
+    Keys are normalized with imageKey, so an image can be looked up by its full path or
+    its Label.txt key. Keeps the number of images per state and the file names of the
+    checked images so that membership and counts are O(1).
+    """
+
+    def __init__(self, items=()):
+        self._states = {}
+        self._counts = Counter()
+        self._checked_names = Counter()
+        self.update(items)
+
+    def __getitem__(self, filePath):
+        return self._states[imageKey(filePath)]
+
+    def __setitem__(self, filePath, state):
+        key = imageKey(filePath)
+        if key in self._states:
+            self._forget(key)
+        self._states[key] = state
+        self._counts[state] += 1
+        if state == CHECKED:
+            self._checked_names[os.path.basename(key)] += 1
+
+    def __delitem__(self, filePath):
+        key = imageKey(filePath)
+        self._forget(key)
+        del self._states[key]
+
+    def _forget(self, key):
+        state = self._states[key]
+        self._counts[state] -= 1
+        if state == CHECKED:
+            name = os.path.basename(key)
+            self._checked_names[name] -= 1
+            if not self._checked_names[name]:
+                del self._checked_names[name]
+
+    def __contains__(self, filePath):
+        return imageKey(filePath) in self._states
+
+    def __iter__(self):
+        return iter(self._states)
+
+    def __len__(self):
+        return len(self._states)
+
+    def __repr__(self):
+        return "StatusIndex(%r)" % self._states
+
+    def isChecked(self, filePath):
+        return self._states.get(imageKey(filePath)) == CHECKED
+
+    def hasCheckedName(self, filename):
+        """True if a checked image has the file name filename, in any directory"""
+        return filename in self._checked_names
+
+    def count(self, state=CHECKED):
+        return self._counts[state]
@@ -59,7 +59,7 @@ class StringBundle:
 
     def __create_lookup_fallback_list(self, locale_str):
         result_paths = []
-        base_path = ":/strings"
+        base_path = "strings"
         result_paths.append(base_path)
         if locale_str is not None:
             # Don't follow standard BCP47. Simple fallback
@@ -70,9 +70,21 @@ class StringBundle:
 
         return result_paths
 
-    def __loadBundle(self, path):
+    def __bundlePath(self, name):
+        """
+        The .properties file of the bundle name. Only when the resource files are not shipped
+        are the compiled Qt resources imported, to read the bundle from them instead.
+        """
+        if os.path.isdir(__dirpath__):
+            file_name = "strings-en" if name == "strings" else name
+            return os.path.join(__dirpath__, file_name + ".properties")
+        import libs.resources  # noqa: F401, registers the ":/" resources
+
+        return ":/" + name
+
+    def __loadBundle(self, name):
         PROP_SEPERATOR = "="
-        f = QFile(path)
+        f = QFile(self.__bundlePath(name))
         if f.exists():
             if f.open(QIODevice.ReadOnly | QFile.Text):
                 text = QTextStream(f)
@@ -29,14 +29,22 @@ logger = logging.getLogger("PPOCRLabel")
 __dir__ = os.path.dirname(os.path.abspath(__file__))
 __iconpath__ = os.path.abspath(os.path.join(__dir__, "../resources/icons"))
 
+# QIcon is implicitly shared, so one instance per icon and size serves every caller
+_icon_cache = {}
+
 
 def newIcon(icon, iconSize=None):
+    cached = _icon_cache.get((icon, iconSize))
+    if cached is not None:
+        return cached
     if iconSize is not None:
-        return QIcon(
+        cached = QIcon(
             QIcon(__iconpath__ + "/" + icon + ".png").pixmap(iconSize, iconSize)
         )
     else:
-        return QIcon(__iconpath__ + "/" + icon + ".png")
+        cached = QIcon(__iconpath__ + "/" + icon + ".png")
+    _icon_cache[(icon, iconSize)] = cached
+    return cached
 
 
 def newButton(text, icon=None, slot=None):
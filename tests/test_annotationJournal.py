@@ -0,0 +1,103 @@
+import os
+import sys
+import tempfile
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, ".."))
+
+from libs.annotationJournal import AnnotationJournal
+
+BOX = {"transcription": "发票", "points": [[0, 0], [9, 0], [9, 9], [0, 9]]}
+
+
+class TestAnnotationJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "Label.txt.journal")
+        self.journal = AnnotationJournal(self.path, compact_records=3)
+
+    def tearDown(self):
+        self.journal.close()
+        self.tmp_dir.cleanup()
+
+    def replayed(self, states=None, labels=None):
+        states = dict(states or {})
+        labels = dict(labels or {})
+        count = AnnotationJournal(self.path).replay(states, labels)
+        return count, states, labels
+
+    def test_replayOverBaseFiles(self):
+        states = {"a/1.jpg": 1, "b/2.jpg": 1}
+        labels = {"a/1.jpg": [BOX], "b/2.jpg": [BOX]}
+        self.journal.append("c/3.jpg", 1, [BOX])
+        self.journal.append("a/1.jpg", None, None)
+        self.journal.append("b/2.jpg", 1, None)
+        self.journal.append("c/3.jpg", 1, [])
+        count, states, labels = self.replayed(states, labels)
+        self.assertEqual(count, 4)
+        self.assertEqual(states, {"b/2.jpg": 1, "c/3.jpg": 1})
+        self.assertEqual(labels, {"c/3.jpg": []})
+
+    def test_replayTwiceSameResult(self):
+        self.journal.append("a/1.jpg", 1, [BOX])
+        _, states, labels = self.replayed()
+        _, states_again, labels_again = self.replayed(states, labels)
+        self.assertEqual((states_again, labels_again), (states, labels))
+
+    def test_tornLastRecord(self):
+        self.journal.append("a/1.jpg", 1, [BOX])
+        self.journal.append("b/2.jpg", 1, [BOX])
+        self.journal.close()
+        with open(self.path, "rb+") as f:
+            f.truncate(os.path.getsize(self.path) - 10)
+        count, states, labels = self.replayed()
+        self.assertEqual(count, 1)
+        self.assertEqual(states, {"a/1.jpg": 1})
+        self.assertEqual(labels, {"a/1.jpg": [BOX]})
+
+    def test_compaction(self):
+        for i in range(3):
+            self.journal.append("a/%d.jpg" % i, 1, [BOX])
+        self.assertTrue(self.journal.needsCompaction())
+        written = []
+        self.journal.compact(lambda: written.append(True))
+        # records of the images saved while the files are written go to a new journal
+        self.journal.append("b/1.jpg", 1, [BOX])
+        self.journal.wait()
+        self.assertEqual(written, [True])
+        self.assertFalse(self.journal.needsCompaction())
+        self.assertFalse(os.path.exists(self.path + ".old"))
+        count, states, _ = self.replayed()
+        self.assertEqual(count, 1)
+        self.assertEqual(states, {"b/1.jpg": 1})
+
+    def test_failedCompactionKeepsRecords(self):
+        self.journal.append("a/1.jpg", 1, [BOX])
+
+        def fail():
+            raise OSError("disk full")
+
+        self.journal.compact(fail)
+        self.journal.wait()
+        self.journal.append("b/2.jpg", 1, [BOX])
+        count, states, _ = self.replayed()
+        self.assertEqual(count, 2)
+        self.assertEqual(states, {"a/1.jpg": 1, "b/2.jpg": 1})
+
+        # the next compaction keeps the records of the failed one until it succeeds
+        self.journal.compact(fail)
+        self.journal.wait()
+        self.assertEqual(self.replayed()[0], 2)
+        self.journal.compact(lambda: None)
+        self.journal.wait()
+        self.assertEqual(self.replayed()[0], 0)
+
+    def test_reset(self):
+        self.journal.append("a/1.jpg", 1, [BOX])
+        self.journal.reset()
+        self.assertEqual(self.replayed()[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, ".."))
+
+from libs.annotationStore import AnnotationStore
+
+LABEL = '[{"transcription": "发票", "points": [[0, 0], [9, 0], [9, 9], [0, 9]], "difficult": false}]'
+
+
+class TestAnnotationStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = AnnotationStore(os.path.join(self.tmp_dir.name, "annotations.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def roundTrip(self, data):
+        path = os.path.join(self.tmp_dir.name, "Label.txt")
+        with open(path, "wb") as f:
+            f.write(data)
+        self.store.importFile("label", path)
+        self.store.exportFile("label", path)
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_roundTrip(self):
+        data = ("a/1.jpg\t%s\nb/2.jpg\t[]\n" % LABEL).encode("utf-8")
+        self.assertEqual(self.roundTrip(data), data)
+
+    def test_roundTripBlankAndBrokenLines(self):
+        data = (
+            "a/1.jpg\t%s\r\n\nno tab here\n  \nb/2.jpg\t[{broken\n\n" % LABEL
+        ).encode("utf-8")
+        self.assertEqual(self.roundTrip(data), data)
+
+    def test_roundTripNoFinalNewline(self):
+        data = ("a/1.jpg\t%s\nb/2.jpg\t[]" % LABEL).encode("utf-8")
+        self.assertEqual(self.roundTrip(data), data)
+
+    def test_appendAfterBlankLines(self):
+        data = ("a/1.jpg\t%s\n\n\n" % LABEL).encode("utf-8")
+        self.roundTrip(data)
+        self.store.put("label", "c/3.jpg", [])
+        path = os.path.join(self.tmp_dir.name, "Label.txt")
+        self.store.exportFile("label", path)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), data + b"c/3.jpg\t[]\n")
+
+    def test_upsertKeepsOrder(self):
+        data = ("a/1.jpg\t[]\n\nb/2.jpg\t[]\nno tab here\n").encode("utf-8")
+        self.roundTrip(data)
+        for _ in range(3):
+            self.store.put("label", "c/3.jpg", [])
+            self.store.putMany("label", [("a/1.jpg", []), ("d/4.jpg", [])])
+            self.store.put("label", "b/2.jpg", [])
+        self.assertEqual(
+            list(self.store.load("label")), ["a/1.jpg", "b/2.jpg", "c/3.jpg", "d/4.jpg"]
+        )
+        path = os.path.join(self.tmp_dir.name, "Label.txt")
+        self.store.exportFile("label", path)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), data + b"c/3.jpg\t[]\nd/4.jpg\t[]\n")
+
+    def test_replaceKeepsUnparsedLines(self):
+        data = ("no tab here\na/1.jpg\t%s\nb/2.jpg\t[{broken\n" % LABEL).encode("utf-8")
+        self.roundTrip(data)
+        labels = self.store.load("label")
+        self.assertEqual(list(labels), ["a/1.jpg"])
+        labels["c/3.jpg"] = []
+        self.store.replace("label", labels)
+        path = os.path.join(self.tmp_dir.name, "Label.txt")
+        self.store.exportFile("label", path)
+        with open(path, "rb") as f:
+            lines = f.read().decode("utf-8").split("\n")
+        self.assertEqual(
+            lines,
+            [
+                "a/1.jpg\t" + LABEL,
+                "c/3.jpg\t[]",
+                "b/2.jpg\t[{broken",
+                "no tab here",
+                "",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
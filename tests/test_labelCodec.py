@@ -0,0 +1,109 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, ".."))
+
+from libs.labelCodec import (
+    LabelDict,
+    copyLabels,
+    formatLine,
+    parseLabel,
+    readLabelFile,
+    writeLabelFile,
+)
+
+BOX = {"transcription": "发票", "points": [[0, 0], [9, 0], [9, 9], [0, 9]]}
+
+
+class TestParseLabel(unittest.TestCase):
+    def test_json(self):
+        self.assertEqual(
+            parseLabel('[{"transcription": "a", "difficult": false, "key_cls": null}]'),
+            [{"transcription": "a", "difficult": False, "key_cls": None}],
+        )
+
+    def test_literalEvalFallback(self):
+        self.assertEqual(
+            parseLabel("[{'transcription': 'a', 'difficult': False, 'key_cls': None}]"),
+            [{"transcription": "a", "difficult": False, "key_cls": None}],
+        )
+
+    def test_empty(self):
+        self.assertEqual(parseLabel("  \n"), [])
+
+    def test_noEval(self):
+        with self.assertRaises(ValueError):
+            parseLabel("[__import__('os').getcwd()]")
+
+    def test_formatLine(self):
+        line = formatLine("a/1.jpg", [BOX])
+        self.assertTrue(line.endswith("\n"))
+        key, _, label = line.partition("\t")
+        self.assertEqual(key, "a/1.jpg")
+        self.assertEqual(parseLabel(label), [BOX])
+
+
+class TestLabelFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "Label.txt")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, text):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def read(self):
+        with open(self.path, encoding="utf-8") as f:
+            return f.read()
+
+    def test_roundTrip(self):
+        labels = {"a/1.jpg": [BOX], "b/2.jpg": []}
+        writeLabelFile(self.path, labels)
+        self.assertEqual(readLabelFile(self.path), labels)
+
+    def test_laterLinesWin(self):
+        self.write("a/1.jpg\t[]\na/1.jpg\t%s\n" % json.dumps([BOX], ensure_ascii=False))
+        self.assertEqual(readLabelFile(self.path), {"a/1.jpg": [BOX]})
+
+    def test_unparsedLinesKept(self):
+        self.write(
+            "a/1.jpg\t[]\nno tab here\nb/2.jpg\t[{broken\n\n"
+            "c/3.jpg\t[{'transcription': 'x'}]\n"
+        )
+        labels = readLabelFile(self.path)
+        self.assertIsInstance(labels, LabelDict)
+        self.assertEqual(labels, {"a/1.jpg": [], "c/3.jpg": [{"transcription": "x"}]})
+        self.assertEqual(labels.unparsed, ["no tab here", "b/2.jpg\t[{broken"])
+
+        writeLabelFile(self.path, copyLabels(labels))
+        self.assertEqual(
+            self.read(),
+            'a/1.jpg\t[]\nc/3.jpg\t[{"transcription": "x"}]\n'
+            "no tab here\nb/2.jpg\t[{broken\n",
+        )
+        self.assertEqual(readLabelFile(self.path).unparsed, labels.unparsed)
+
+    def test_unparsedLineReplacedByRecord(self):
+        self.write("b/2.jpg\t[{broken\nno tab here\n")
+        labels = readLabelFile(self.path)
+        labels["b/2.jpg"] = [BOX]
+        writeLabelFile(self.path, labels)
+        self.assertEqual(self.read(), formatLine("b/2.jpg", [BOX]) + "no tab here\n")
+        labels = readLabelFile(self.path)
+        self.assertEqual(labels, {"b/2.jpg": [BOX]})
+        self.assertEqual(labels.unparsed, ["no tab here"])
+
+    def test_plainDict(self):
+        writeLabelFile(self.path, {"a/1.jpg": []})
+        self.assertEqual(self.read(), "a/1.jpg\t[]\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, ".."))
+
+from libs import labelIndex
+from libs.labelCodec import syntheticLabels, writeLabelFile
+from libs.labelIndex import LabelFileIndex, LazyLabels, isLargeLabelFile
+
+BROKEN = 'images/broken.jpg\t[{"transcription": "x", "points": [[0, 0]\n'
+
+
+class TestLazyLabels(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "Label.txt")
+        self.labels = syntheticLabels(200)
+        writeLabelFile(self.path, self.labels)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(BROKEN)
+        # about 50 kB of labels read lazily, like a Label.txt of LAZY_LOAD_MB
+        self.lazy_load_mb = labelIndex.LAZY_LOAD_MB
+        labelIndex.LAZY_LOAD_MB = 0.01
+
+    def tearDown(self):
+        labelIndex.LAZY_LOAD_MB = self.lazy_load_mb
+        self.tmp_dir.cleanup()
+
+    def test_brokenRecordReadsEmpty(self):
+        self.assertTrue(isLargeLabelFile(self.path))
+        labels = LazyLabels(LabelFileIndex(self.path))
+        self.assertEqual(labels["images/broken.jpg"], [])
+        self.assertEqual(
+            labels["images/0000007.jpg"], self.labels["images/0000007.jpg"]
+        )
+        items = dict(labels.items())
+        self.assertEqual(items.pop("images/broken.jpg"), [])
+        self.assertEqual(items, self.labels)
+        self.assertEqual(dict(labels.base.items())["images/broken.jpg"], [])
+
+    def test_brokenRecordWrittenBack(self):
+        labels = LazyLabels(LabelFileIndex(self.path))
+        dict(labels.items())
+        # only the first image is checked, the rest stays in memory
+        labels["images/0000000.jpg"] = []
+        labels.writeFile(["images/0000000.jpg"])
+        with open(self.path, encoding="utf-8") as f:
+            content = f.read()
+        self.assertEqual(content, "images/0000000.jpg\t[]\n" + BROKEN)
+        self.assertEqual(labels["images/broken.jpg"], [])
+        self.assertEqual(
+            labels["images/0000005.jpg"], self.labels["images/0000005.jpg"]
+        )
+
+    def test_indexIsJson(self):
+        LabelFileIndex(self.path)
+        with open(self.path + ".idx", "rb") as f:
+            self.assertEqual(f.read(1), b"{")
+        reopened = LabelFileIndex(self.path)
+        self.assertEqual(len(reopened), len(self.labels) + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
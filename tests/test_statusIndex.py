@@ -0,0 +1,83 @@
+import os
+import sys
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, ".."))
+
+from libs.statusIndex import _SPLITER, CHECKED, StatusIndex, imageKey
+
+
+def fullPath(*parts):
+    # a path the way the image list holds it on this platform
+    return _SPLITER.join(("", "data", "scans") + parts)
+
+
+class TestImageKey(unittest.TestCase):
+    def test_fullPath(self):
+        self.assertEqual(imageKey(fullPath("batch1", "a.jpg")), "batch1/a.jpg")
+
+    def test_labelKeyUnchanged(self):
+        self.assertEqual(imageKey("batch1/a.jpg"), "batch1/a.jpg")
+        self.assertEqual(imageKey("a.jpg"), "a.jpg")
+
+    def test_caseKept(self):
+        self.assertEqual(imageKey(fullPath("Batch1", "A.JPG")), "Batch1/A.JPG")
+        self.assertNotEqual(imageKey("Batch1/A.JPG"), imageKey("batch1/a.jpg"))
+
+
+class TestStatusIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = StatusIndex(
+            [("batch1/a.jpg", CHECKED), ("batch1/b.jpg", CHECKED), ("batch2/a.jpg", 0)]
+        )
+
+    def test_lookupByPathOrKey(self):
+        self.assertIn(fullPath("batch1", "a.jpg"), self.index)
+        self.assertIn("batch1/a.jpg", self.index)
+        self.assertTrue(self.index.isChecked(fullPath("batch1", "b.jpg")))
+        self.assertFalse(self.index.isChecked("batch2/a.jpg"))
+        self.assertNotIn("Batch1/a.jpg", self.index)
+        self.assertEqual(self.index[fullPath("batch2", "a.jpg")], 0)
+
+    def test_setByPathStoresKey(self):
+        self.index[fullPath("batch3", "c.jpg")] = CHECKED
+        self.assertEqual(
+            list(self.index),
+            ["batch1/a.jpg", "batch1/b.jpg", "batch2/a.jpg", "batch3/c.jpg"],
+        )
+
+    def test_countsAfterToggling(self):
+        self.assertEqual(self.index.count(), 2)
+        self.assertEqual(self.index.count(0), 1)
+        self.index[fullPath("batch1", "a.jpg")] = 0
+        self.index["batch2/a.jpg"] = CHECKED
+        self.index["batch2/a.jpg"] = CHECKED
+        self.assertEqual(self.index.count(), 2)
+        self.assertEqual(self.index.count(0), 1)
+        self.assertEqual(len(self.index), 3)
+
+    def test_countsAfterDeleting(self):
+        del self.index[fullPath("batch1", "a.jpg")]
+        self.assertEqual(self.index.count(), 1)
+        self.assertEqual(len(self.index), 2)
+        del self.index["batch2/a.jpg"]
+        self.assertEqual(self.index.count(0), 0)
+        with self.assertRaises(KeyError):
+            del self.index["batch2/a.jpg"]
+
+    def test_checkedNames(self):
+        self.assertTrue(self.index.hasCheckedName("a.jpg"))
+        del self.index["batch1/a.jpg"]
+        # batch2/a.jpg has the same file name but is not checked
+        self.assertFalse(self.index.hasCheckedName("a.jpg"))
+        self.index["batch2/a.jpg"] = CHECKED
+        self.index["batch1/a.jpg"] = CHECKED
+        self.index["batch1/a.jpg"] = 0
+        self.assertTrue(self.index.hasCheckedName("a.jpg"))
+        self.assertTrue(self.index.hasCheckedName("b.jpg"))
+        self.assertFalse(self.index.hasCheckedName("c.jpg"))
+
+
+if __name__ == "__main__":
+    unittest.main()